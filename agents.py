@@ -1,18 +1,24 @@
-import os
-from typing import Dict, Any
-from autogen import AssistantAgent
-from dotenv import load_dotenv
-import streamlit as st
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Any, Optional
+from utils.config import ConfigProvider, get_config_provider
+
+if TYPE_CHECKING:
+    from autogen import AssistantAgent
 
-load_dotenv()
-def get_llm_config() -> Dict[str, Any]:
+
+def get_llm_config(provider: Optional[ConfigProvider] = None) -> Dict[str, Any]:
+    if provider is None:
+        provider = get_config_provider()
     config_list = []
 
-    groq_model = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
-    or_model = os.getenv("OPENROUTER_MODEL", "meta-llama/llama-3.2-3b-instruct")
+    groq_model = provider.get("GROQ_MODEL", "llama-3.3-70b-versatile")
+    or_model = provider.get("OPENROUTER_MODEL", "meta-llama/llama-3.2-3b-instruct")
 
-    user_groq_key = st.session_state.get("user_groq_key")
-    user_openrouter_key = st.session_state.get("user_openrouter_key")
+    user_groq_key = provider.get("user_groq_key")
+    user_openrouter_key = provider.get("user_openrouter_key")
 
     if user_groq_key:
         config_list.append({
@@ -34,46 +40,36 @@ def get_llm_config() -> Dict[str, Any]:
             },
         })
         
-    free_groq_keys = []
-    free_or_keys = []
-
-    # Load from Streamlit secrets (this is what Streamlit Cloud supports)
-    if "GROQ_API_KEY" in st.secrets:
-        free_groq_keys += st.secrets["GROQ_API_KEY"].split(",")
-
-    if "OPENROUTER_API_KEY" in st.secrets:
-        free_or_keys += st.secrets["OPENROUTER_API_KEY"].split(",")
-
-    # Also allow ENV variables for local dev
-    free_groq_keys += os.getenv("GROQ_API_KEY", "").split(",")
-    free_or_keys   += os.getenv("OPENROUTER_API_KEY", "").split(",")
-
-    for key in map(str.strip, free_groq_keys):
-        if key:
-            config_list.append({
-                "model": groq_model,
-                "api_key": key,
-                "base_url": "https://api.groq.com/openai/v1",
-                "api_type": "openai",
-            })
-
-    for key in map(str.strip, free_or_keys):
-        if key:
-            config_list.append({
-                "model": or_model,
-                "api_key": key,
-                "base_url": "https://openrouter.ai/api/v1",
-                "api_type": "openai",
-                "default_headers": {
-                    "HTTP-Referer": "http://localhost",
-                    "X-Title": "Saksham",
-                },
-            })
+    # Comma-separated pools of demo keys (Streamlit secrets and/or env vars,
+    # depending on the provider)
+    free_groq_keys = provider.get_list("GROQ_API_KEY")
+    free_or_keys = provider.get_list("OPENROUTER_API_KEY")
+
+    for key in free_groq_keys:
+        config_list.append({
+            "model": groq_model,
+            "api_key": key,
+            "base_url": "https://api.groq.com/openai/v1",
+            "api_type": "openai",
+        })
+
+    for key in free_or_keys:
+        config_list.append({
+            "model": or_model,
+            "api_key": key,
+            "base_url": "https://openrouter.ai/api/v1",
+            "api_type": "openai",
+            "default_headers": {
+                "HTTP-Referer": "http://localhost",
+                "X-Title": "Saksham",
+            },
+        })
 
     # 3️⃣ Final safety
     if not config_list:
         raise RuntimeError(
-            "No LLM API keys found. Please enter a key or configure Streamlit secrets."
+            "No LLM API keys found. Please enter a key, configure Streamlit secrets "
+            "or set GROQ_API_KEY / OPENROUTER_API_KEY."
         )
 
     return {
@@ -138,7 +134,9 @@ def build_agent(
     system_message: str,
     llm_config: Dict[str, Any],
     human_input_mode: str = "NEVER"
-) -> AssistantAgent:
+) -> "AssistantAgent":
+    # autogen is slow to import; only pay for it once agents are built.
+    from autogen import AssistantAgent
 
     agent = AssistantAgent(
         name=name,
@@ -148,8 +146,9 @@ def build_agent(
     )
     return agent
 
-def create_all_agents() -> Dict[str, Any]:
-    base_config = get_llm_config()
+def create_all_agents(base_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    if base_config is None:
+        base_config = get_llm_config()
     
     creative_config = base_config.copy()
     creative_config["temperature"] = 0.8
@@ -878,10 +877,6 @@ REQUIREMENTS:
         llm_config=creative_config,
     )
     
-    import os
-    workspace_path = os.path.abspath("workspace")
-    os.makedirs(workspace_path, exist_ok=True)
-    
     Controller_agent = build_agent(
         name="Controller_agent",
         system_message="""
@@ -904,4 +899,47 @@ REQUIREMENTS:
         "QA_Agent": QA_Agent,
         "Deployment_agent": Deployment_agent,
         "UI_agent": UI_agent,
-    }
\ No newline at end of file
+    }
+
+
+# Agents hold no per-run state that the orchestrator relies on (it passes the
+# chat history explicitly), so one set of agents per LLM config is shared by
+# every run and Streamlit session in the process.
+MAX_POOLED_AGENT_SETS = 16
+_agent_pool: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_agent_pool_lock = threading.Lock()
+
+
+def config_fingerprint(llm_config: Dict[str, Any]) -> str:
+    raw = json.dumps(llm_config, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def reset_agents(agents: Dict[str, Any]):
+    for agent in agents.values():
+        if getattr(agent, "_oai_messages", None):
+            agent.clear_history()
+
+
+def get_agents(llm_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Return the pooled agents for ``llm_config``, building them on first use.
+
+    The pool keeps the most recently used MAX_POOLED_AGENT_SETS configs, so
+    sessions with their own API keys don't grow it without bound.
+    """
+    if llm_config is None:
+        llm_config = get_llm_config()
+    fingerprint = config_fingerprint(llm_config)
+    with _agent_pool_lock:
+        agents = _agent_pool.get(fingerprint)
+        if agents is not None:
+            _agent_pool.move_to_end(fingerprint)
+    if agents is None:
+        agents = create_all_agents(llm_config)
+        with _agent_pool_lock:
+            agents = _agent_pool.setdefault(fingerprint, agents)
+            _agent_pool.move_to_end(fingerprint)
+            while len(_agent_pool) > MAX_POOLED_AGENT_SETS:
+                _agent_pool.popitem(last=False)
+    reset_agents(agents)
+    return agents
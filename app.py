@@ -1,13 +1,14 @@
 import os
 os.environ["PYTHONDONTWRITEBYTECODE"] = "1"
-import zipfile
-import io
 import streamlit as st
 from pathlib import Path
-from typing import Dict, Any
-from agents import create_all_agents
-from workflow import run_workflow
+from typing import Dict, Any, Optional
+from agents import get_agents
+from utils.config import StreamlitConfigProvider, set_config_provider
+from utils.archive import get_archive_cache
+from utils.jobs import get_job_manager
 from utils.logger import setup_logger
+from utils.workspace import workspace_for
 
 # ================== CONFIG ==================
 st.set_page_config(
@@ -18,14 +19,23 @@ st.set_page_config(
 )
 
 logger = setup_logger()
-WORKSPACE_DIR = "workspace"
+set_config_provider(StreamlitConfigProvider())
 
 
 # ================== HELPERS ==================
-def cleanup_pycache():
-    if os.path.exists(WORKSPACE_DIR):
+def current_workspace() -> Optional[str]:
+    """Workspace directory of this session's latest run, if it has one."""
+    result = st.session_state.get("workflow_result") or {}
+    if not result.get("run_id"):
+        return None
+    path = workspace_for(result["run_id"])
+    return path if os.path.isdir(path) else None
+
+
+def cleanup_pycache(workspace: Optional[str]):
+    if workspace and os.path.exists(workspace):
         import shutil
-        pycache = Path(WORKSPACE_DIR) / "__pycache__"
+        pycache = Path(workspace) / "__pycache__"
         if pycache.exists():
             try:
                 shutil.rmtree(pycache)
@@ -35,9 +45,11 @@ def cleanup_pycache():
 
 def clear_workspace():
     import shutil
-    if os.path.exists(WORKSPACE_DIR):
-        shutil.rmtree(WORKSPACE_DIR)
-    os.makedirs(WORKSPACE_DIR, exist_ok=True)
+    workspace = current_workspace()
+    if workspace:
+        shutil.rmtree(workspace, ignore_errors=True)
+    st.session_state.pop("workflow_result", None)
+    st.query_params.pop("run", None)
     st.success("Workspace cleared successfully.")
 
 
@@ -57,22 +69,92 @@ def is_token_limit_error(msg: str) -> bool:
         ]
     )
     
-def create_workspace_zip() -> bytes:
+def create_workspace_zip(workspace: str) -> bytes:
+    """
+    ZIP of the workspace directory as bytes for st.download_button.
+    The archive is cached until a workspace file changes, so reruns
+    don't recompress it.
     """
-    Create an in-memory ZIP of the workspace directory.
-    Returns bytes suitable for st.download_button.
+    return get_archive_cache().get(workspace).read_bytes()
+
+def format_line_ranges(lines) -> str:
+    ranges = []
+    for line in lines:
+        if ranges and line == ranges[-1][1] + 1:
+            ranges[-1][1] = line
+        else:
+            ranges.append([line, line])
+    return ", ".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+
+AGENT_ORDER = [
+    "Controller_agent",
+    "Requirements_Agent",
+    "coding_agent",
+    "review_agent",
+    "Documentation_Agent",
+    "QA_Agent",
+    "Deployment_agent",
+    "UI_agent",
+]
+
+
+def track_job(run_id: str):
+    """Follow ``run_id`` in this session; the id also goes into the URL so a
+    reload picks the run back up."""
+    st.session_state.job_id = run_id
+    st.session_state.pop("workflow_result", None)
+    st.query_params["run"] = run_id
+
+
+@st.fragment(run_every=1.0)
+def display_job_progress():
+    """Poll the background job of this session and render its progress.
+
+    Only this fragment reruns while the job is going; once it finishes the
+    result moves to ``workflow_result`` and the whole page reruns.
     """
-    zip_buffer = io.BytesIO()
+    run_id = st.session_state.get("job_id")
+    if not run_id:
+        return
+    job = get_job_manager().status(run_id)
+    if job is None:
+        st.session_state.pop("job_id", None)
+        st.query_params.pop("run", None)
+        st.warning(f"Run {run_id} was not found.")
+        return
+
+    if job["status"] in ("completed", "failed"):
+        st.session_state.workflow_result = job["result"]
+        st.session_state.pop("job_id", None)
+        st.rerun()
+
+    stages = job["stages"]
+    completed = sum(1 for agent in AGENT_ORDER if stages.get(agent) == "completed")
+    st.progress(completed / len(AGENT_ORDER))
+
+    if job["status"] == "queued":
+        st.markdown(f"### 🕒 Queued (position {job.get('queue_position', 1)}), run `{run_id}`")
+    elif job["current_stage"]:
+        st.markdown(f"### ⏳ Currently running: **{job['current_stage'].replace('_', ' ')}**")
+
+    lines = []
+    for agent in AGENT_ORDER:
+        s = stages.get(agent)
+        if s == "completed":
+            lines.append(f"✅ {agent.replace('_', ' ')}")
+        elif s == "running":
+            lines.append(f"⏳ {agent.replace('_', ' ')}")
+        else:
+            lines.append(f"• {agent.replace('_', ' ')}")
+    st.markdown("\n".join(lines))
 
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
-        for root, _, files in os.walk(WORKSPACE_DIR):
-            for file in files:
-                file_path = os.path.join(root, file)
-                arcname = os.path.relpath(file_path, WORKSPACE_DIR)
-                zipf.write(file_path, arcname)
+    live_file = job["live_file"]
+    if live_file:
+        st.markdown(f"**{live_file['agent'].replace('_', ' ')}** is writing `{live_file['filename']}`")
+        language = "python" if live_file["filename"].endswith(".py") else "text"
+        st.code(live_file["content"], language=language)
 
-    zip_buffer.seek(0)
-    return zip_buffer.read()
 
 def display_test_results(test_results: Dict[str, Any]):
     if not test_results:
@@ -84,6 +166,8 @@ def display_test_results(test_results: Dict[str, Any]):
     status = test_results.get("status", "unknown")
     if status in ["passed", "success"]:
         st.success("All tests executed successfully.")
+    if test_results.get("cached"):
+        st.caption("Code and tests are unchanged since an earlier run; showing its results.")
 
     c1, c2, c3, c4 = st.columns(4)
     c1.metric("Total Tests", test_results.get("total_tests", 0))
@@ -91,18 +175,47 @@ def display_test_results(test_results: Dict[str, Any]):
     c3.metric("Failed", test_results.get("total_failed", 0))
     c4.metric("Errors", test_results.get("total_errors", 0))
 
+    coverage = test_results.get("coverage")
+    if coverage:
+        c5, c6 = st.columns(2)
+        c5.metric("Line Coverage", f"{coverage.get('line_percent', 0)}%")
+        c6.metric("Function Coverage", f"{coverage.get('function_percent', 0)}%")
+        with st.expander("Coverage by file"):
+            st.dataframe(
+                [
+                    {
+                        "File": name,
+                        "Lines": f"{f['lines_covered']}/{f['lines_total']} ({f['line_percent']}%)",
+                        "Functions": f"{f['functions_covered']}/{f['functions_total']} ({f['function_percent']}%)",
+                        "Missing lines": format_line_ranges(f.get("missing_lines", [])),
+                        "Uncalled functions": ", ".join(f.get("missing_functions", [])),
+                    }
+                    for name, f in coverage.get("files", {}).items()
+                ],
+                use_container_width=True,
+            )
+
     for idx, item in enumerate(test_results.get("test_results", []), start=1):
         with st.expander(f"Test File {idx}: {item.get('file', 'unknown')}"):
+            tests = item.get("tests") or []
+            if tests:
+                st.dataframe(
+                    [
+                        {"Test": t.get("id"), "Outcome": t.get("outcome"), "Seconds": t.get("duration")}
+                        for t in tests
+                    ],
+                    use_container_width=True,
+                )
             st.code(item.get("output", ""), language="text")
 
 
-def display_workspace_artifacts():
-    cleanup_pycache()
-    if not os.path.exists(WORKSPACE_DIR):
+def display_workspace_artifacts(workspace: Optional[str]):
+    cleanup_pycache(workspace)
+    if not workspace or not os.path.exists(workspace):
         st.info("No generated files yet.")
         return
 
-    files = list(Path(WORKSPACE_DIR).glob("*"))
+    files = list(Path(workspace).glob("*"))
 
     groups = {
         "Core Code": ["main.py"],
@@ -122,12 +235,12 @@ def display_workspace_artifacts():
                     st.code(f.read_text(encoding="utf-8"), language="text")
 
 
-def launch_generated_ui_section():
-    ui_path = os.path.join(WORKSPACE_DIR, "app_ui.py")
+def launch_generated_ui_section(workspace: Optional[str]):
+    ui_path = os.path.join(workspace, "app_ui.py") if workspace else None
 
     st.subheader("Preview the Generated Application")
 
-    if not os.path.exists(ui_path):
+    if not ui_path or not os.path.exists(ui_path):
         st.info("No UI was generated for this project.")
         return
 
@@ -153,11 +266,10 @@ with st.sidebar:
 
     st.markdown(
         """
-**Workspace Reset (Recommended)**
+**Workspace**
 
-To avoid file conflicts:
-- Clear workspace **before starting**
-- Clear workspace **after finishing**
+Every run writes to its own workspace folder, and old ones are cleaned up
+automatically. Clearing removes this session's generated files.
 """
     )
 
@@ -169,8 +281,8 @@ To avoid file conflicts:
     st.subheader("🔐 Bring Your Own API Key (Optional)")
 
     st.caption(
-        "If provided, your key will be used first. "
-        "Otherwise, the app falls back to the demo keys."
+        "If provided, your key joins the key pool and shares the load "
+        "with the demo keys; rate-limited keys are skipped automatically."
     )
 
     user_groq_key = st.text_input(
@@ -208,7 +320,7 @@ To avoid file conflicts:
 
 
 # ================== UI ==================
-cleanup_pycache()
+cleanup_pycache(current_workspace())
 
 tabs = st.tabs(
     ["Introduction", "Project Knowledge", "Build Application"]
@@ -352,77 +464,22 @@ You do **not** need to specify:
         placeholder="Example: Build a Python module implementing an LRU Cache.",
     )
 
-    if st.button("Launch AI Team") and user_request.strip():
-        import time
-
-        # ---- initialize timing ----
-        st.session_state.workflow_start_time = time.time()
-
-        # ---- UI placeholders (persistent) ----
-        progress_bar = st.progress(0.0)
-        current_agent_text = st.empty()
-        status_text = st.empty()
-
-        AGENT_ORDER = [
-            "Controller_agent",
-            "Requirements_Agent",
-            "coding_agent",
-            "review_agent",
-            "Documentation_Agent",
-            "QA_Agent",
-            "Deployment_agent",
-            "UI_agent",
-        ]
-
-        agent_status = {a: "pending" for a in AGENT_ORDER}
-
-        # ---- progress callback (in-place updates only) ----
-        def progress_callback(agent_name: str, state: str):
-            agent_status[agent_name] = state
-
-            completed = sum(
-                1 for s in agent_status.values() if s == "completed"
-            )
-            total = len(agent_status)
-
-            progress_bar.progress(completed / total)
-
-            if state == "running":
-                current_agent_text.markdown(
-                    f"### ⏳ Currently running: **{agent_name.replace('_', ' ')}**"
-                )
-            elif state == "completed":
-                current_agent_text.markdown(
-                    f"### ✅ Completed: **{agent_name.replace('_', ' ')}**"
-                )
-
-            lines = []
-            for agent in AGENT_ORDER:
-                s = agent_status[agent]
-                if s == "completed":
-                    lines.append(f"✅ {agent.replace('_', ' ')}")
-                elif s == "running":
-                    lines.append(f"⏳ {agent.replace('_', ' ')}")
-                else:
-                    lines.append(f"• {agent.replace('_', ' ')}")
-
-            status_text.markdown("\n".join(lines))
-
-        # ---- run workflow ----
-        agents = create_all_agents()
-        result = run_workflow(
-            user_request,
-            agents,
-            progress_callback=progress_callback
-        )
-
-        # ---- finalize timing ----
-        st.session_state.workflow_end_time = time.time()
-        st.session_state.workflow_result = result
-
+    # A reload starts a new session; pick the run back up from the URL
+    if "job_id" not in st.session_state and "workflow_result" not in st.session_state:
+        run_id = st.query_params.get("run")
+        if run_id:
+            st.session_state.job_id = run_id
+
+    running = bool(st.session_state.get("job_id"))
+    if st.button("Launch AI Team", disabled=running) and user_request.strip():
+        # Agents are built here so this session's config (API keys) applies
+        agents = get_agents()
+        track_job(get_job_manager().submit(user_request, agents))
         st.rerun()
 
-            
+    if st.session_state.get("job_id"):
+        display_job_progress()
+
     if "workflow_result" in st.session_state:
         res = st.session_state.workflow_result
 
@@ -448,11 +505,17 @@ You can:
             else:
                 st.error(msg)
 
+            if res.get("run_id") and st.button("Resume from last completed stage"):
+                agents = get_agents()
+                track_job(get_job_manager().resume(res["run_id"], agents))
+                st.rerun()
+
     st.divider()
     st.header("Generated Project Files")
+    workspace = current_workspace()
     # ---- DOWNLOAD ZIP ----
-    if os.path.exists(WORKSPACE_DIR) and any(Path(WORKSPACE_DIR).rglob("*")):
-        zip_bytes = create_workspace_zip()
+    if workspace and any(Path(workspace).rglob("*")):
+        zip_bytes = create_workspace_zip(workspace)
 
         st.download_button(
             label="⬇️ Download Project as ZIP",
@@ -464,13 +527,13 @@ You can:
     else:
         st.info("No files available to download yet.")
 
-    display_workspace_artifacts()   
+    display_workspace_artifacts(workspace)   
     st.divider()
-    launch_generated_ui_section()
+    launch_generated_ui_section(workspace)
     st.divider()
     st.header("Launch Options")
     
-    if os.path.exists(os.path.join(WORKSPACE_DIR, "Dockerfile")):
+    if workspace and os.path.exists(os.path.join(workspace, "Dockerfile")):
         st.subheader("Docker (Recommended)")
 
         st.markdown(
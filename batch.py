@@ -0,0 +1,229 @@
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, Optional, List
+from agents import get_agents
+from utils.config import get_config_provider
+from utils.checkpoint import get_checkpoint_store
+from utils.logger import setup_logger
+from workflow import WorkflowOrchestrator
+
+logger = setup_logger()
+
+RUN_ID_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def load_specs(path: str) -> List[Dict[str, str]]:
+    """Specs from a JSONL file: one object per line with ``request`` (or
+    ``user_request``) and an optional ``id``, or a bare JSON string. Specs
+    without an id are named after their line number."""
+    specs = []
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path} line {number}: invalid JSON: {e.msg}")
+            if isinstance(entry, str):
+                entry = {"request": entry}
+            if not isinstance(entry, dict):
+                raise ValueError(f"{path} line {number}: expected an object or a string")
+            request = entry.get("request") or entry.get("user_request")
+            if not isinstance(request, str) or not request.strip():
+                raise ValueError(f"{path} line {number}: missing 'request'")
+            spec_id = str(entry.get("id") or f"line-{number}")
+            if spec_id in seen:
+                raise ValueError(f"{path} line {number}: duplicate id {spec_id!r}")
+            seen.add(spec_id)
+            specs.append({"id": spec_id, "request": request})
+    return specs
+
+
+def run_id_for(spec: Dict[str, str]) -> str:
+    """Stable run id of a spec, so an interrupted batch resumes the same
+    checkpoint. It changes when the request text changes."""
+    digest = hashlib.sha256(json.dumps([spec["id"], spec["request"]]).encode("utf-8")).hexdigest()
+    name = RUN_ID_UNSAFE.sub("_", spec["id"]).strip("._")[:40] or "spec"
+    return f"batch-{name}-{digest[:10]}"
+
+
+def load_finished(path: str) -> Dict[str, Dict[str, Any]]:
+    """Last record per spec id in an existing output file."""
+    finished = {}
+    if not os.path.exists(path):
+        return finished
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn last line from an interrupted run
+                continue
+            if isinstance(record, dict) and "id" in record:
+                finished[record["id"]] = record
+    return finished
+
+
+def summarize_test_results(test_results: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Totals of a test run without the per-test details and output."""
+    if not test_results:
+        return None
+    summary = {
+        key: test_results.get(key)
+        for key in ("status", "message", "total_tests", "total_passed", "total_failed",
+                    "total_errors", "total_skipped", "cached")
+        if key in test_results
+    }
+    coverage = test_results.get("coverage")
+    if coverage:
+        summary["line_percent"] = coverage.get("line_percent")
+        summary["function_percent"] = coverage.get("function_percent")
+    return summary
+
+
+class BatchRunner:
+    """Runs specs through the pipeline, ``concurrency`` at a time, appending
+    one result record per spec to ``output_path`` as each finishes."""
+
+    def __init__(self, output_path: str, concurrency: int = 2, max_review_iterations: int = 5,
+                 agents: Optional[Dict[str, Any]] = None, fresh: bool = False):
+        self.output_path = output_path
+        # Start every spec over instead of resuming its checkpoint
+        self.fresh = fresh
+        self.concurrency = max(1, concurrency)
+        self.max_review_iterations = max_review_iterations
+        self.agents = agents
+        self._write_lock = threading.Lock()
+
+    def run_spec(self, spec: Dict[str, str]) -> Dict[str, Any]:
+        run_id = run_id_for(spec)
+        orchestrator = WorkflowOrchestrator(
+            self.agents,
+            max_review_iterations=self.max_review_iterations,
+            run_id=run_id,
+        )
+        store = get_checkpoint_store()
+        if self.fresh:
+            store.delete(run_id)
+        # Pick up where an interrupted (or failed, when retried) run stopped
+        resumed = store.load_state(run_id) is not None
+        started = time.time()
+        try:
+            if resumed:
+                result = orchestrator.resume()
+            else:
+                result = orchestrator.initiate_workflow(spec["request"])
+        except Exception as e:
+            logger.error(f"Spec {spec['id']} crashed: {str(e)}")
+            result = {"status": "error", "error": f"{type(e).__name__}: {str(e)}"}
+        finished = time.time()
+        return {
+            "id": spec["id"],
+            "run_id": run_id,
+            "status": result.get("status"),
+            "error": result.get("error"),
+            "resumed": resumed,
+            "review_iterations": result.get("review_iterations", 0),
+            "files_extracted": result.get("files_extracted", 0),
+            "workspace": result.get("workspace"),
+            "test_results": summarize_test_results(result.get("test_results")),
+            "started_at": started,
+            "finished_at": finished,
+            "duration_seconds": round(finished - started, 3),
+        }
+
+    def write_record(self, record: Dict[str, Any]):
+        with self._write_lock:
+            with open(self.output_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def run(self, specs: List[Dict[str, str]]) -> Dict[str, int]:
+        if self.agents is None:
+            self.agents = get_agents()
+        counts = {"success": 0, "error": 0}
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch")
+        try:
+            futures = {executor.submit(self.run_spec, spec): spec for spec in specs}
+            for done, future in enumerate(as_completed(futures), start=1):
+                record = future.result()
+                self.write_record(record)
+                status = "success" if record["status"] == "success" else "error"
+                counts[status] += 1
+                print(
+                    f"[{done}/{len(specs)}] {record['id']}: {status} "
+                    f"({record['duration_seconds']:.0f}s, {record['review_iterations']} review iteration(s))",
+                    flush=True,
+                )
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown(wait=True)
+        return counts
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    config = get_config_provider()
+    parser = argparse.ArgumentParser(
+        description="Run application specs from a JSONL file through the agent pipeline."
+    )
+    parser.add_argument("specs", help="JSONL file with one spec per line")
+    parser.add_argument("-o", "--output", help="JSONL file for the result records "
+                                               "(default: <specs>.results.jsonl)")
+    parser.add_argument("-j", "--concurrency", type=int,
+                        default=int(config.get("BATCH_CONCURRENCY", "2")),
+                        help="pipelines to run at once (default: BATCH_CONCURRENCY or 2)")
+    parser.add_argument("--max-review-iterations", type=int, default=5)
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="run specs again whose last record is an error")
+    parser.add_argument("--force", action="store_true",
+                        help="run every spec from scratch, even those already in the output")
+    args = parser.parse_args(argv)
+
+    try:
+        specs = load_specs(args.specs)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    output = args.output or f"{os.path.splitext(args.specs)[0]}.results.jsonl"
+
+    pending = specs
+    if not args.force:
+        finished = load_finished(output)
+        pending = [
+            spec for spec in specs
+            if spec["id"] not in finished
+            or (args.retry_failed and finished[spec["id"]].get("status") != "success")
+        ]
+        if len(pending) < len(specs):
+            print(f"Skipping {len(specs) - len(pending)} spec(s) already in {output}", flush=True)
+    if not pending:
+        return 0
+
+    print(f"Running {len(pending)} spec(s), {args.concurrency} at a time; results go to {output}", flush=True)
+    runner = BatchRunner(output, concurrency=args.concurrency, max_review_iterations=args.max_review_iterations,
+                         fresh=args.force)
+    try:
+        counts = runner.run(pending)
+    except KeyboardInterrupt:
+        # Finished records are on disk and running pipelines have checkpoints;
+        # don't wait for them, a rerun resumes them.
+        print("Interrupted; rerun the same command to resume.", file=sys.stderr, flush=True)
+        os._exit(130)
+    print(f"Done: {counts['success']} succeeded, {counts['error']} failed", flush=True)
+    return 0 if counts["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+import os
+import re
+import sys
+import json
+import asyncio
+import argparse
+from http import HTTPStatus
+from typing import Dict, Any, Optional, Tuple
+from agents import get_agents
+from utils.archive import get_archive_cache
+from utils.config import get_config_provider
+from utils.jobs import JobQueueFull, get_job_manager
+from utils.logger import setup_logger
+from utils.workspace import workspace_for
+
+logger = setup_logger()
+
+ROUTE_PATTERN = re.compile(r"^/runs/([A-Za-z0-9_.-]+)(/events|/artifacts\.zip|/resume)?$")
+HEADER_TIMEOUT = 10.0
+MAX_HEADER_BYTES = 16 * 1024
+EVENT_POLL_INTERVAL = 0.5
+EVENT_HEARTBEAT = 15.0
+
+
+class HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+def public_status(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """Job snapshot as returned to clients: the result without the transcript."""
+    snapshot = dict(snapshot)
+    if snapshot.get("result"):
+        snapshot["result"] = {k: v for k, v in snapshot["result"].items() if k != "messages"}
+    return snapshot
+
+
+class PipelineServer:
+    """HTTP front end of the process-wide JobManager.
+
+    POST /runs                    submit {"request": "..."}; 202 with the run id
+    GET  /runs/<id>               stage-level status
+    GET  /runs/<id>/events        progress as server-sent events
+    GET  /runs/<id>/artifacts.zip generated files of a finished run
+    POST /runs/<id>/resume        continue a failed run from its checkpoint
+    GET  /health                  load and limits
+
+    Submissions beyond ``max_in_flight`` queued or running runs get 429.
+    Agents and the key pool are process-wide, so they are shared by all runs.
+    """
+
+    def __init__(self, max_in_flight: int = 8, max_body_bytes: int = 64 * 1024):
+        self.max_in_flight = max_in_flight
+        self.max_body_bytes = max_body_bytes
+        self.jobs = get_job_manager()
+
+    # ---- HTTP plumbing ----
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                method, path, body = await asyncio.wait_for(self._read_request(reader), HEADER_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise HTTPError(HTTPStatus.REQUEST_TIMEOUT, "Request not received in time")
+            except asyncio.LimitOverrunError:
+                raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Headers too large")
+            except (asyncio.IncompleteReadError, ValueError):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request")
+            await self.dispatch(method, path, body, writer)
+        except HTTPError as e:
+            await self._send_json(writer, e.status, {"status": "error", "error": e.message}, e.headers)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        except Exception as e:
+            logger.error(f"Request failed: {type(e).__name__}: {str(e)}")
+            try:
+                await self._send_json(writer, HTTPStatus.INTERNAL_SERVER_ERROR,
+                                      {"status": "error", "error": "Internal server error"})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", "0"))
+        if length > self.max_body_bytes:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Body exceeds {self.max_body_bytes} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target.split("?", 1)[0], body
+
+    @staticmethod
+    async def _send(writer: asyncio.StreamWriter, status: HTTPStatus, body: bytes, content_type: str,
+                    headers: Optional[Dict[str, str]] = None):
+        lines = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            "Connection: close",
+        ]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: HTTPStatus, payload: Dict[str, Any],
+                         headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        await self._send(writer, status, body, "application/json", headers)
+
+    # ---- routes ----
+
+    async def dispatch(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter):
+        if path == "/health" and method == "GET":
+            await self._send_json(writer, HTTPStatus.OK, {
+                "status": "ok",
+                "in_flight": self.jobs.in_flight(),
+                "max_in_flight": self.max_in_flight,
+                "workers": self.jobs.max_concurrent,
+            })
+            return
+        if path == "/runs":
+            if method != "POST":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST to submit a run")
+            await self.submit(body, writer)
+            return
+
+        match = ROUTE_PATTERN.match(path)
+        if not match:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {path}")
+        run_id, action = match.group(1), match.group(2)
+        if action == "/resume":
+            if method != "POST":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST to resume a run")
+            await self.resume(run_id, writer)
+            return
+        if method != "GET":
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"Use GET for {path}")
+        if action is None:
+            await self._send_json(writer, HTTPStatus.OK, public_status(self._status(run_id)))
+        elif action == "/events":
+            await self.stream_events(run_id, writer)
+        else:
+            await self.send_artifacts(run_id, writer)
+
+    def _status(self, run_id: str) -> Dict[str, Any]:
+        snapshot = self.jobs.status(run_id)
+        if snapshot is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown run {run_id}")
+        return snapshot
+
+    async def _enqueue(self, writer: asyncio.StreamWriter, queue_run):
+        loop = asyncio.get_running_loop()
+        try:
+            # Building the orchestrator touches disk; keep it off the event loop
+            run_id = await loop.run_in_executor(None, queue_run)
+        except JobQueueFull as e:
+            raise HTTPError(HTTPStatus.TOO_MANY_REQUESTS, str(e), {"Retry-After": "30"})
+        await self._send_json(writer, HTTPStatus.ACCEPTED, {
+            "status": "queued",
+            "run_id": run_id,
+            "status_url": f"/runs/{run_id}",
+            "events_url": f"/runs/{run_id}/events",
+            "artifacts_url": f"/runs/{run_id}/artifacts.zip",
+        }, {"Location": f"/runs/{run_id}"})
+
+    async def submit(self, body: bytes, writer: asyncio.StreamWriter):
+        try:
+            spec = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be JSON")
+        request = spec.get("request") if isinstance(spec, dict) else None
+        if not isinstance(request, str) or not request.strip():
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Missing 'request'")
+        options = {}
+        if "max_review_iterations" in spec:
+            try:
+                options["max_review_iterations"] = max(1, min(10, int(spec["max_review_iterations"])))
+            except (TypeError, ValueError):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "'max_review_iterations' must be an integer")
+        # Fail fast before building anything when the server is saturated
+        if self.jobs.in_flight() >= self.max_in_flight:
+            raise HTTPError(HTTPStatus.TOO_MANY_REQUESTS,
+                            f"{self.max_in_flight} pipeline run(s) already queued or running",
+                            {"Retry-After": "30"})
+        await self._enqueue(writer, lambda: self.jobs.submit(
+            request, get_agents(), max_in_flight=self.max_in_flight, **options
+        ))
+
+    async def resume(self, run_id: str, writer: asyncio.StreamWriter):
+        snapshot = self._status(run_id)
+        if snapshot["status"] == "completed":
+            raise HTTPError(HTTPStatus.CONFLICT, f"Run {run_id} already completed")
+        await self._enqueue(writer, lambda: self.jobs.resume(
+            run_id, get_agents(), max_in_flight=self.max_in_flight
+        ))
+
+    async def stream_events(self, run_id: str, writer: asyncio.StreamWriter):
+        """Server-sent events: ``stage`` on every stage change, ``file`` when
+        an agent starts writing another file, ``queue`` while waiting, and a
+        final ``done`` with the run's status."""
+        snapshot = self._status(run_id)
+        writer.write((
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: text/event-stream\r\n"
+            "Cache-Control: no-cache\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode("latin-1"))
+
+        def event(name: str, data: Dict[str, Any]):
+            writer.write(f"event: {name}\ndata: {json.dumps(data, default=str)}\n\n".encode("utf-8"))
+
+        stages: Dict[str, str] = {}
+        live_file = None
+        queue_position = None
+        idle = 0.0
+        while True:
+            sent = False
+            if snapshot["status"] == "queued" and snapshot.get("queue_position") != queue_position:
+                queue_position = snapshot.get("queue_position")
+                event("queue", {"position": queue_position})
+                sent = True
+            for role, state in snapshot["stages"].items():
+                if stages.get(role) != state:
+                    stages[role] = state
+                    event("stage", {"role": role, "state": state})
+                    sent = True
+            current = snapshot["live_file"]
+            if current and (current["agent"], current["filename"]) != live_file:
+                live_file = (current["agent"], current["filename"])
+                event("file", {"agent": current["agent"], "filename": current["filename"]})
+                sent = True
+            if snapshot["status"] in ("completed", "failed"):
+                event("done", {"status": snapshot["status"], "error": snapshot["error"]})
+                await writer.drain()
+                return
+
+            idle = 0.0 if sent else idle + EVENT_POLL_INTERVAL
+            if idle >= EVENT_HEARTBEAT:
+                writer.write(b": keep-alive\n\n")
+                idle = 0.0
+            await writer.drain()
+            await asyncio.sleep(EVENT_POLL_INTERVAL)
+            snapshot = self._status(run_id)
+
+    async def send_artifacts(self, run_id: str, writer: asyncio.StreamWriter):
+        snapshot = self._status(run_id)
+        if snapshot["status"] in ("queued", "running"):
+            raise HTTPError(HTTPStatus.CONFLICT, f"Run {run_id} is still {snapshot['status']}")
+        workspace = workspace_for(run_id)
+        if not os.path.isdir(workspace):
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Run {run_id} has no generated files")
+        loop = asyncio.get_running_loop()
+        archive = await loop.run_in_executor(None, get_archive_cache().get, workspace)
+        writer.write((
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: application/zip\r\n"
+            f"Content-Length: {archive.size}\r\n"
+            f'Content-Disposition: attachment; filename="{run_id}.zip"\r\n'
+            f'ETag: "{archive.digest}"\r\n'
+            "Connection: close\r\n\r\n"
+        ).encode("latin-1"))
+        # Large archives live on disk; send them in chunks instead of one buffer
+        for chunk in archive.iter_chunks():
+            writer.write(chunk)
+            await writer.drain()
+
+
+async def serve(host: str, port: int, server: PipelineServer):
+    listener = await asyncio.start_server(server.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+    logger.info(f"Pipeline API listening on http://{host}:{port} "
+                f"({server.jobs.max_concurrent} worker(s), max {server.max_in_flight} in flight)")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None) -> int:
+    config = get_config_provider()
+    parser = argparse.ArgumentParser(description="HTTP API for submitting and polling pipeline runs.")
+    parser.add_argument("--host", default=config.get("SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(config.get("SERVER_PORT", "8000")))
+    parser.add_argument("--max-in-flight", type=int, default=int(config.get("SERVER_MAX_IN_FLIGHT", "8")),
+                        help="queued plus running runs before submissions get 429")
+    args = parser.parse_args(argv)
+
+    server = PipelineServer(
+        max_in_flight=args.max_in_flight,
+        max_body_bytes=int(config.get("SERVER_MAX_BODY_KB", "64")) * 1024,
+    )
+    try:
+        asyncio.run(serve(args.host, args.port, server))
+    except KeyboardInterrupt:
+        logger.info("Pipeline API stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import unittest
+from utils.convergence import ReviewConvergence
+from workflow import static_review
+
+CODE_A = """import json
+
+
+def load(path):
+    with open(path) as f
+        return json.load(f)
+"""
+
+CODE_B = """import json
+import os
+
+
+def load(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f
+        return json.load(f)
+"""
+
+MODEL_REVIEW = """FIX_REQUIRED
+1. load() does not handle a missing file (line 5)
+2. Add docstrings to the public functions
+"""
+
+
+class ReviewConvergenceTest(unittest.TestCase):
+
+    def test_same_static_error_on_rewritten_code_keeps_going(self):
+        convergence = ReviewConvergence()
+        first, second = static_review({"main.py": CODE_A}), static_review({"main.py": CODE_B})
+        self.assertIn("SyntaxError", first)
+        self.assertIn("SyntaxError", second)
+        self.assertIsNone(convergence.observe(CODE_A, first))
+        self.assertIsNone(convergence.observe(CODE_B, second))
+
+    def test_repeated_issues_on_rewritten_code_keep_going(self):
+        convergence = ReviewConvergence()
+        self.assertIsNone(convergence.observe(CODE_A, MODEL_REVIEW))
+        self.assertIsNone(convergence.observe(CODE_B, MODEL_REVIEW.replace("line 5", "line 7")))
+
+    def test_repeated_issues_on_near_identical_code_stop(self):
+        convergence = ReviewConvergence()
+        code = "\n".join(f"value_{n} = {n}" for n in range(100))
+        self.assertIsNone(convergence.observe(code, MODEL_REVIEW))
+        self.assertIsNotNone(convergence.observe(code + "\nvalue_100 = 100", MODEL_REVIEW))
+
+    def test_unchanged_code_stops(self):
+        convergence = ReviewConvergence()
+        self.assertIsNone(convergence.observe(CODE_A, MODEL_REVIEW))
+        self.assertIn("unchanged", convergence.observe(CODE_A + "\n\n", MODEL_REVIEW))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from utils.patching import PatchConflict, apply_search_replace, parse_patches
+
+SOURCE = "def add(a, b):\n    return a - b\n"
+
+
+class ParsePatchesTest(unittest.TestCase):
+
+    def test_search_replace_block(self):
+        reply = (
+            "===BEGIN_PATCH:main.py===\n"
+            "<<<<<<< SEARCH\n"
+            "    return a - b\n"
+            "=======\n"
+            "    return a + b\n"
+            ">>>>>>> REPLACE\n"
+            "===END_PATCH===\n"
+        )
+        patches = parse_patches(reply)
+        self.assertEqual(patches, {"main.py": [("    return a - b", "    return a + b")]})
+        self.assertEqual(apply_search_replace(SOURCE, patches["main.py"]), "def add(a, b):\n    return a + b\n")
+
+    def test_block_without_hunks_is_a_conflict(self):
+        reply = (
+            "===BEGIN_PATCH:main.py===\n"
+            "--- a/main.py\n"
+            "+++ b/main.py\n"
+            "@@ -1,2 +1,2 @@\n"
+            "-    return a - b\n"
+            "+    return a + b\n"
+            "===END_PATCH===\n"
+        )
+        with self.assertRaises(PatchConflict):
+            parse_patches(reply)
+
+    def test_unterminated_hunk_is_a_conflict(self):
+        reply = (
+            "===BEGIN_PATCH:main.py===\n"
+            "<<<<<<< SEARCH\n"
+            "    return a - b\n"
+            "=======\n"
+            "    return a + b\n"
+            "===END_PATCH===\n"
+        )
+        with self.assertRaises(PatchConflict):
+            parse_patches(reply)
+
+    def test_reply_without_patches(self):
+        self.assertEqual(parse_patches("===BEGIN_FILE:main.py===\nx = 1\n===END_FILE==="), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
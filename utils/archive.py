@@ -0,0 +1,156 @@
+import os
+import hashlib
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+from utils.config import get_config_provider
+from utils.logger import setup_logger
+
+logger = setup_logger()
+
+# Formats that are compressed already; deflating them again only costs CPU
+STORED_EXTENSIONS = {
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".lzma", ".zst", ".7z", ".rar",
+    ".whl", ".jar", ".egg",
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico",
+    ".mp3", ".mp4", ".ogg", ".webm", ".woff", ".woff2",
+    ".docx", ".xlsx", ".pptx", ".odt",
+}
+
+SKIPPED_DIRS = {"__pycache__"}
+
+
+def workspace_manifest(workspace: str) -> List[Tuple[str, int, int]]:
+    """(relative path, size, mtime in ns) of every file that goes into the
+    archive, in archive order."""
+    entries = []
+    for root, dirs, files in os.walk(workspace):
+        dirs[:] = sorted(d for d in dirs if d not in SKIPPED_DIRS)
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((os.path.relpath(path, workspace), stat.st_size, stat.st_mtime_ns))
+    return entries
+
+
+def manifest_digest(manifest: List[Tuple[str, int, int]]) -> str:
+    digest = hashlib.sha256()
+    for relpath, size, mtime in manifest:
+        digest.update(f"{relpath}\0{size}\0{mtime}\n".encode("utf-8", "surrogateescape"))
+    return digest.hexdigest()
+
+
+class WorkspaceArchive:
+    """A built ZIP of one workspace state, held in a spooled temp file: in
+    memory up to the spool size, on disk beyond it."""
+
+    def __init__(self, digest: str, spool, size: int, file_count: int):
+        self.digest = digest
+        self.size = size
+        self.file_count = file_count
+        self._spool = spool
+        self._lock = threading.Lock()
+
+    def read_range(self, offset: int, length: int) -> bytes:
+        # Readers share one file position
+        with self._lock:
+            self._spool.seek(offset)
+            return self._spool.read(length)
+
+    def iter_chunks(self, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        offset = 0
+        while offset < self.size:
+            chunk = self.read_range(offset, chunk_size)
+            if not chunk:
+                break
+            offset += len(chunk)
+            yield chunk
+
+    def read_bytes(self) -> bytes:
+        return self.read_range(0, self.size)
+
+
+def build_archive(workspace: str, manifest: List[Tuple[str, int, int]], digest: str,
+                  spool_bytes: int) -> WorkspaceArchive:
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_bytes, prefix="workspace-", suffix=".zip")
+    count = 0
+    with zipfile.ZipFile(spool, "w", zipfile.ZIP_DEFLATED) as zf:
+        for relpath, _, _ in manifest:
+            path = os.path.join(workspace, relpath)
+            stored = os.path.splitext(relpath)[1].lower() in STORED_EXTENSIONS
+            try:
+                zf.write(path, relpath, compress_type=zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED)
+            except FileNotFoundError:
+                # Removed since the manifest was taken; the next call sees a new manifest
+                continue
+            count += 1
+    size = spool.tell()
+    return WorkspaceArchive(digest, spool, size, count)
+
+
+class WorkspaceArchiveCache:
+    """ZIPs of workspaces, rebuilt only when a file is added, removed or
+    changes size or mtime.
+
+    Keeps the ``max_entries`` most recently used archives. Concurrent
+    requests for the same workspace state build it once.
+    """
+
+    def __init__(self, max_entries: int = 16, spool_bytes: int = 8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.spool_bytes = spool_bytes
+        self._archives: "OrderedDict[str, WorkspaceArchive]" = OrderedDict()
+        self._building: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, workspace: str) -> WorkspaceArchive:
+        workspace = os.path.abspath(workspace)
+        manifest = workspace_manifest(workspace)
+        digest = manifest_digest(manifest)
+        key = f"{workspace}\0{digest}"
+        with self._lock:
+            archive = self._archives.get(key)
+            if archive is not None:
+                self._archives.move_to_end(key)
+                return archive
+            build_lock = self._building.setdefault(key, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                archive = self._archives.get(key)
+            if archive is None:
+                archive = build_archive(workspace, manifest, digest, self.spool_bytes)
+                logger.info(f"Built archive of {workspace}: {archive.file_count} file(s), {archive.size} bytes")
+                with self._lock:
+                    # Older states of this workspace can't be asked for again
+                    for stale in [k for k in self._archives if k.split("\0", 1)[0] == workspace]:
+                        del self._archives[stale]
+                    self._archives[key] = archive
+                    while len(self._archives) > self.max_entries:
+                        # Evicted archives close once their last reader drops them
+                        self._archives.popitem(last=False)
+        with self._lock:
+            self._building.pop(key, None)
+        return archive
+
+
+_default_cache: Optional[WorkspaceArchiveCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_archive_cache() -> WorkspaceArchiveCache:
+    """Process-wide archive cache sized by ARCHIVE_CACHE_ENTRIES and ARCHIVE_SPOOL_MB."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            config = get_config_provider()
+            _default_cache = WorkspaceArchiveCache(
+                max_entries=int(config.get("ARCHIVE_CACHE_ENTRIES", "16")),
+                spool_bytes=int(float(config.get("ARCHIVE_SPOOL_MB", "8")) * 1024 * 1024),
+            )
+        return _default_cache
@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+from typing import Dict, Any, Optional, List, Mapping, Sequence
+from utils.config import get_config_provider
+
+
+def new_run_id() -> str:
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:8]
+
+
+class CheckpointStore:
+    """Persists pipeline state after every completed stage.
+
+    Each run gets a directory holding ``state.json`` (rewritten atomically)
+    and ``transcript.jsonl``. The transcript is append-only, so a checkpoint
+    only writes the messages recorded since the previous one; ``state.json``
+    stores how many transcript lines belong to the checkpoint, which makes a
+    crash between the two writes harmless.
+    """
+
+    def __init__(self, directory: str = ".checkpoints"):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._saved_messages: Dict[str, int] = {}
+
+    def run_dir(self, run_id: str) -> str:
+        if not run_id or os.sep in run_id or (os.altsep and os.altsep in run_id) or run_id.startswith("."):
+            raise ValueError(f"Invalid run id: {run_id!r}")
+        return os.path.join(self.directory, run_id)
+
+    def save(self, run_id: str, state: Dict[str, Any], messages: Sequence[Mapping[str, Any]]):
+        """Write ``state`` and append any of ``messages`` not yet persisted.
+
+        Messages are stored as role, name and content, plus the ``artifacts``
+        attribute of TranscriptRecord entries.
+        """
+        run_dir = self.run_dir(run_id)
+        with self._lock:
+            os.makedirs(run_dir, exist_ok=True)
+            transcript_path = os.path.join(run_dir, "transcript.jsonl")
+            saved = self._saved_messages.get(run_id)
+            if saved is None:
+                saved = self._count_lines(transcript_path)
+                if saved > len(messages):
+                    # Stale transcript from a run that was never checkpointed
+                    # this far; start it over.
+                    open(transcript_path, "w").close()
+                    saved = 0
+            if len(messages) > saved:
+                with open(transcript_path, "a", encoding="utf-8") as f:
+                    for message in messages[saved:]:
+                        record = {
+                            "role": message.get("role", "assistant"),
+                            "name": message.get("name", ""),
+                            "content": message.get("content", ""),
+                            "artifacts": list(getattr(message, "artifacts", ())),
+                        }
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                saved = len(messages)
+            self._saved_messages[run_id] = saved
+
+            state = dict(state, run_id=run_id, message_count=saved, updated_at=time.time())
+            fd, tmp_path = tempfile.mkstemp(dir=run_dir, prefix=".state-")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, os.path.join(run_dir, "state.json"))
+
+    def update_status(self, run_id: str, status: str, error: Optional[str] = None):
+        state = self.load_state(run_id)
+        if state is None:
+            return
+        state["status"] = status
+        state["error"] = error
+        run_dir = self.run_dir(run_id)
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(dir=run_dir, prefix=".state-")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, os.path.join(run_dir, "state.json"))
+
+    def load_state(self, run_id: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self.run_dir(run_id), "state.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Return the last checkpoint of ``run_id`` with its transcript under
+        ``"messages"``, or None if the run has no checkpoint."""
+        state = self.load_state(run_id)
+        if state is None:
+            return None
+        messages = []
+        lines = []
+        transcript_path = os.path.join(self.run_dir(run_id), "transcript.jsonl")
+        with self._lock:
+            if os.path.exists(transcript_path):
+                with open(transcript_path, encoding="utf-8") as f:
+                    lines = f.readlines()
+            if len(lines) > state["message_count"]:
+                # Messages appended after the last state write never made it
+                # into a checkpoint; drop them so new ones line up again.
+                lines = lines[:state["message_count"]]
+                with open(transcript_path, "w", encoding="utf-8") as f:
+                    f.writelines(lines)
+            messages = [json.loads(line) for line in lines]
+            self._saved_messages[run_id] = len(messages)
+        state["messages"] = messages
+        return state
+
+    def delete(self, run_id: str):
+        with self._lock:
+            self._saved_messages.pop(run_id, None)
+            shutil.rmtree(self.run_dir(run_id), ignore_errors=True)
+
+    def collect(self, max_age: float, keep: Optional[Sequence[str]] = None,
+                remove: Optional[Sequence[str]] = None) -> List[str]:
+        """Delete checkpoints not written for ``max_age`` seconds, plus the
+        completed ones in ``remove`` (runs whose workspace is gone). Runs in
+        ``keep`` are never deleted. Returns the deleted run ids."""
+        keep = set(keep or ())
+        remove = set(remove or ())
+        now = time.time()
+        removed = []
+        for run_id in self.list_runs():
+            if run_id in keep:
+                continue
+            try:
+                modified = os.path.getmtime(os.path.join(self.run_dir(run_id), "state.json"))
+                state = self.load_state(run_id) if run_id in remove else None
+            except (OSError, ValueError):
+                continue
+            expired = now - modified > max_age
+            if expired or (state is not None and state.get("status") == "completed"):
+                self.delete(run_id)
+                removed.append(run_id)
+        return removed
+
+    def list_runs(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name for name in os.listdir(self.directory)
+            if os.path.exists(os.path.join(self.directory, name, "state.json"))
+        )
+
+    @staticmethod
+    def _count_lines(path: str) -> int:
+        if not os.path.exists(path):
+            return 0
+        with open(path, "rb") as f:
+            return sum(1 for _ in f)
+
+
+_default_store: Optional[CheckpointStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    """Process-wide store rooted at CHECKPOINT_DIR (default ``.checkpoints``)."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = CheckpointStore(get_config_provider().get("CHECKPOINT_DIR", ".checkpoints"))
+        return _default_store
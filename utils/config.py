@@ -0,0 +1,133 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional, List
+
+
+class ConfigProvider(ABC):
+    """Source of configuration values (API keys, model names, tuning knobs).
+
+    The orchestration core only talks to a provider, so it runs the same
+    under Streamlit, in batch workers and in tests.
+    """
+
+    @abstractmethod
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Value of ``key``, or ``default`` when it is not set."""
+
+    def get_list(self, key: str) -> List[str]:
+        """Comma-separated value of ``key`` as a list of non-empty items."""
+        value = self.get(key)
+        if not value:
+            return []
+        return [item.strip() for item in str(value).split(",") if item.strip()]
+
+
+class EnvConfigProvider(ConfigProvider):
+    """Reads the process environment, after loading a ``.env`` file if
+    python-dotenv is installed."""
+
+    def __init__(self, dotenv_path: Optional[str] = None):
+        self.dotenv_path = dotenv_path
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            try:
+                from dotenv import load_dotenv
+            except ImportError:
+                return
+            load_dotenv(self.dotenv_path)
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        if not self._loaded:
+            self._load()
+        return os.environ.get(key, default)
+
+
+class DictConfigProvider(ConfigProvider):
+
+    def __init__(self, values: Dict[str, Any], fallback: Optional[ConfigProvider] = None):
+        self.values = dict(values)
+        self.fallback = fallback
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        if key in self.values and self.values[key] is not None:
+            return str(self.values[key])
+        if self.fallback is not None:
+            return self.fallback.get(key, default)
+        return default
+
+
+class StreamlitConfigProvider(ConfigProvider):
+    """Streamlit adapter: session state, then ``st.secrets``, then the
+    environment. Key pools (``get_list``) combine secrets and environment.
+
+    Values are read from the calling script thread's session, so resolve
+    configuration there before handing work to background threads. Threads
+    without a script run context (background jobs) only see secrets and the
+    environment.
+    """
+
+    def __init__(self, env: Optional[ConfigProvider] = None):
+        self.env = env or EnvConfigProvider()
+
+    @staticmethod
+    def _session_value(key: str) -> Optional[str]:
+        import streamlit as st
+        try:
+            from streamlit.runtime.scriptrunner import get_script_run_ctx
+        except ImportError:
+            get_script_run_ctx = None
+        if get_script_run_ctx is not None and get_script_run_ctx(suppress_warning=True) is None:
+            return None
+        return st.session_state.get(key)
+
+    @staticmethod
+    def _secret(key: str) -> Optional[str]:
+        import streamlit as st
+        try:
+            if key in st.secrets:
+                return str(st.secrets[key])
+        except Exception:
+            # No secrets file configured.
+            pass
+        return None
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        value = self._session_value(key)
+        if value:
+            return value
+        value = self._secret(key)
+        if value:
+            return value
+        return self.env.get(key, default)
+
+    def get_list(self, key: str) -> List[str]:
+        values = []
+        for value in (self._session_value(key), self._secret(key), self.env.get(key)):
+            if value:
+                values.extend(item.strip() for item in str(value).split(",") if item.strip())
+        return values
+
+
+_provider: Optional[ConfigProvider] = None
+_provider_lock = threading.Lock()
+
+
+def set_config_provider(provider: ConfigProvider):
+    global _provider
+    with _provider_lock:
+        _provider = provider
+
+
+def get_config_provider() -> ConfigProvider:
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = EnvConfigProvider()
+        return _provider
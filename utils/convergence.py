@@ -0,0 +1,118 @@
+import re
+import difflib
+import hashlib
+from typing import Dict, Any, Optional, List
+
+ISSUE_LINE_PATTERN = re.compile(r"^\s*(?:\d+\s*[.):]|[-*•])\s*(.+)$")
+LINE_REFERENCE_PATTERN = re.compile(r"\b(?:line|lines|l)\s*\d+(?:\s*-\s*\d+)?\b")
+NON_WORD_PATTERN = re.compile(r"[^a-z0-9_]+")
+
+# Second line of the FIX_REQUIRED verdicts written by workflow.static_review
+STATIC_REVIEW_HEADER = "Automated static check (no model review yet):"
+
+
+def normalize_code(source: str) -> str:
+    """Drop trailing whitespace and blank lines, which a rewrite changes freely."""
+    return "\n".join(line.rstrip() for line in source.splitlines() if line.strip())
+
+
+def normalize_issue(text: str, keep_lines: bool = False) -> str:
+    """Lowercased words of an issue. Line references are dropped unless
+    ``keep_lines``, since a model cites lines loosely."""
+    text = text.lower()
+    if not keep_lines:
+        text = LINE_REFERENCE_PATTERN.sub(" ", text)
+    return " ".join(NON_WORD_PATTERN.sub(" ", text).split())
+
+
+def parse_review_issues(review: str) -> List[str]:
+    """Normalized issues of a FIX_REQUIRED review: its numbered or bulleted
+    items, or the whole body when it has none. Static-check issues keep
+    their line numbers: the same message on another line is another bug."""
+    lines = review.strip().splitlines()[1:]
+    keep_lines = bool(lines) and lines[0].strip() == STATIC_REVIEW_HEADER
+    issues = []
+    for line in lines:
+        match = ISSUE_LINE_PATTERN.match(line)
+        if match:
+            issue = normalize_issue(match.group(1), keep_lines)
+            if issue:
+                issues.append(issue)
+    if not issues:
+        body = normalize_issue(" ".join(lines))
+        if body:
+            issues.append(body)
+    return sorted(set(issues))
+
+
+def issue_overlap(a: List[str], b: List[str]) -> float:
+    if not a or not b:
+        return 0.0
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b)
+
+
+def code_similarity(a: str, b: str) -> float:
+    a_lines, b_lines = a.splitlines(), b.splitlines()
+    matcher = difflib.SequenceMatcher(None, a_lines, b_lines, autojunk=False)
+    # quick_ratio() is an upper bound and much cheaper; most revisions that
+    # genuinely change the code are ruled out by it.
+    if matcher.quick_ratio() < ReviewConvergence.near_identical:
+        return matcher.quick_ratio()
+    return matcher.ratio()
+
+
+class ReviewConvergence:
+    """Watches successive main.py revisions and FIX_REQUIRED reviews and
+    says when another coding round is unlikely to help.
+
+    The loop has stalled when the code comes back unchanged, returns to an
+    earlier revision, or barely changed while the reviewer raises largely
+    the same issues. Repeated issues alone never stop it: a real rewrite
+    deserves another review.
+    """
+
+    near_identical = 0.98
+    overlapping_issues = 0.5
+
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        state = state or {}
+        self.code_hashes: List[str] = list(state.get("code_hashes", []))
+        self.previous_code: Optional[str] = state.get("previous_code")
+        self.previous_issues: List[str] = list(state.get("previous_issues", []))
+
+    def state(self) -> Dict[str, Any]:
+        return {
+            "code_hashes": self.code_hashes,
+            "previous_code": self.previous_code,
+            "previous_issues": self.previous_issues,
+        }
+
+    def observe(self, code: str, review: str) -> Optional[str]:
+        """Record the reviewed code and its FIX_REQUIRED review. Returns the
+        reason to stop the loop, or None while it is still making progress."""
+        code = normalize_code(code or "")
+        digest = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        issues = parse_review_issues(review)
+        previous_code, previous_issues = self.previous_code, self.previous_issues
+
+        reason = None
+        if self.code_hashes and digest == self.code_hashes[-1]:
+            reason = "coding_agent returned main.py unchanged"
+        elif digest in self.code_hashes:
+            revision = self.code_hashes.index(digest) + 1
+            reason = f"main.py went back to revision {revision}; the loop is oscillating"
+        elif previous_code is not None:
+            overlap = issue_overlap(issues, previous_issues)
+            if overlap >= self.overlapping_issues:
+                similarity = code_similarity(previous_code, code)
+                if similarity >= self.near_identical:
+                    reason = (
+                        f"main.py is {similarity:.0%} identical to the last revision "
+                        f"and the issues overlap {overlap:.0%}"
+                    )
+
+        self.code_hashes.append(digest)
+        self.previous_code = code
+        self.previous_issues = issues
+        return reason
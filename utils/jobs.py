@@ -0,0 +1,219 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List
+from utils.config import get_config_provider
+from utils.logger import setup_logger
+
+logger = setup_logger()
+
+JOB_STATES = ("queued", "running", "completed", "failed")
+
+
+class JobQueueFull(RuntimeError):
+    """The manager already holds as many unfinished jobs as the caller allows."""
+
+
+class Job:
+    """One pipeline run owned by the JobManager, with the progress the UI polls."""
+
+    def __init__(self, run_id: str, user_request: str, resume: bool = False):
+        self.run_id = run_id
+        self.user_request = user_request
+        self.resume = resume
+        self.status = "queued"
+        self.stages: Dict[str, str] = {}
+        self.current_stage: Optional[str] = None
+        self.live_file: Optional[Dict[str, str]] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def on_progress(self, role: str, state: str):
+        with self._lock:
+            self.stages[role] = state
+            if state == "running":
+                self.current_stage = role
+
+    def on_stream(self, role: str, filename: str, content: str):
+        with self._lock:
+            # The UI only shows the tail of the file being written
+            self.live_file = {"agent": role, "filename": filename, "content": content[-3000:]}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "run_id": self.run_id,
+                "user_request": self.user_request,
+                "status": self.status,
+                "stages": dict(self.stages),
+                "current_stage": self.current_stage,
+                "live_file": dict(self.live_file) if self.live_file else None,
+                "result": self.result,
+                "error": self.error,
+                "submitted_at": self.submitted_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobManager:
+    """Runs pipelines on a bounded pool of background threads.
+
+    submit() and resume() return the run id at once; callers poll status()
+    with it. Jobs live in this process, so any session (or a reloaded page)
+    holding the run id can follow them. The newest ``max_finished`` finished
+    jobs are kept for later lookups; older ones can still be found through
+    their checkpoint.
+    """
+
+    def __init__(self, max_concurrent: int = 2, max_finished: int = 200):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_finished = max_finished
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="pipeline")
+
+    def submit(self, user_request: str, agents: Dict[str, Any], max_in_flight: Optional[int] = None,
+               **options) -> str:
+        """Queue a new run. ``agents`` must already be built, since
+        configuration is resolved on the caller's thread. ``options`` go to
+        WorkflowOrchestrator. Raises JobQueueFull when ``max_in_flight`` jobs
+        are already queued or running."""
+        from workflow import WorkflowOrchestrator
+        from utils.checkpoint import new_run_id
+
+        run_id = options.pop("run_id", None) or new_run_id()
+        job = Job(run_id, user_request)
+        orchestrator = WorkflowOrchestrator(
+            agents,
+            run_id=run_id,
+            progress_callback=job.on_progress,
+            stream_callback=job.on_stream,
+            **options,
+        )
+        return self._enqueue(job, lambda: orchestrator.initiate_workflow(user_request), max_in_flight)
+
+    def resume(self, run_id: str, agents: Dict[str, Any], max_in_flight: Optional[int] = None,
+               **options) -> str:
+        """Queue the continuation of a checkpointed run under the same id."""
+        from workflow import WorkflowOrchestrator
+
+        with self._lock:
+            existing = self._jobs.get(run_id)
+            if existing is not None and existing.status in ("queued", "running"):
+                return run_id
+        job = Job(run_id, existing.user_request if existing else "", resume=True)
+        orchestrator = WorkflowOrchestrator(
+            agents,
+            run_id=run_id,
+            progress_callback=job.on_progress,
+            stream_callback=job.on_stream,
+            **options,
+        )
+        return self._enqueue(job, orchestrator.resume, max_in_flight)
+
+    def _enqueue(self, job: Job, run, max_in_flight: Optional[int] = None) -> str:
+        with self._lock:
+            if max_in_flight is not None and self._in_flight() >= max_in_flight:
+                raise JobQueueFull(f"{max_in_flight} pipeline run(s) already queued or running")
+            self._jobs[job.run_id] = job
+            self._jobs.move_to_end(job.run_id)
+            self._trim()
+        self._executor.submit(self._execute, job, run)
+        logger.info(f"Queued pipeline run {job.run_id}")
+        return job.run_id
+
+    def _execute(self, job: Job, run):
+        with job._lock:
+            job.status = "running"
+            job.started_at = time.time()
+        try:
+            result = run()
+        except Exception as e:
+            # The orchestrator reports its own errors; this only catches bugs around it
+            logger.error(f"Pipeline run {job.run_id} crashed: {str(e)}")
+            result = {"status": "error", "error": f"{type(e).__name__}: {str(e)}", "run_id": job.run_id}
+        with job._lock:
+            job.result = result
+            job.status = "completed" if result.get("status") == "success" else "failed"
+            job.error = result.get("error")
+            job.finished_at = time.time()
+        logger.info(f"Pipeline run {job.run_id} {job.status}")
+
+    def _in_flight(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status in ("queued", "running"))
+
+    def in_flight(self) -> int:
+        """Jobs queued or running right now."""
+        with self._lock:
+            return self._in_flight()
+
+    def _trim(self):
+        finished = [run_id for run_id, job in self._jobs.items() if job.status in ("completed", "failed")]
+        for run_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[run_id]
+
+    def status(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Snapshot of a job, with its queue position while queued. Runs this
+        process no longer (or never) tracked are looked up in the
+        checkpoint store; None if nothing is known about ``run_id``."""
+        with self._lock:
+            job = self._jobs.get(run_id)
+            queued = [j.run_id for j in self._jobs.values() if j.status == "queued"]
+        if job is not None:
+            snapshot = job.snapshot()
+            if snapshot["status"] == "queued" and run_id in queued:
+                snapshot["queue_position"] = queued.index(run_id) + 1
+            return snapshot
+
+        from utils.checkpoint import get_checkpoint_store
+        try:
+            state = get_checkpoint_store().load_state(run_id)
+        except (ValueError, OSError):
+            return None
+        if state is None:
+            return None
+        # "running" here means the process running it is gone; it can be resumed
+        status = "completed" if state.get("status") == "completed" else "failed"
+        error = state.get("error") or ("Run was interrupted" if status == "failed" else None)
+        return {
+            "run_id": run_id,
+            "user_request": state.get("user_request", ""),
+            "status": status,
+            "stages": {role: "completed" for role in state.get("pipeline", [])[:state.get("position", 0)]},
+            "current_stage": None,
+            "live_file": None,
+            "result": {"status": "success" if status == "completed" else "error", "error": error, "run_id": run_id},
+            "error": error,
+            "submitted_at": None,
+            "started_at": None,
+            "finished_at": state.get("updated_at"),
+        }
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.snapshot() for job in jobs]
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+_default_manager: Optional[JobManager] = None
+_default_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Process-wide manager running up to JOB_WORKERS pipelines at once."""
+    global _default_manager
+    with _default_manager_lock:
+        if _default_manager is None:
+            _default_manager = JobManager(
+                max_concurrent=int(get_config_provider().get("JOB_WORKERS", "2")),
+            )
+        return _default_manager
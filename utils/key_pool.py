@@ -0,0 +1,290 @@
+import re
+import json
+import time
+import hashlib
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, List, Tuple
+from utils.config import get_config_provider
+from utils.logger import setup_logger
+
+logger = setup_logger()
+
+
+class KeyPoolExhausted(RuntimeError):
+    """Raised when every key is rate limited for longer than we are willing to wait."""
+
+
+class TokenBucket:
+
+    def __init__(self, capacity: float, per_second: float):
+        self.capacity = capacity
+        self.per_second = per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.per_second)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        # Requests larger than the whole bucket are let through once it is full.
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.per_second
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount: float, now: float):
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def drain(self):
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+
+
+class KeyState:
+    """Budget and health of one API key (one config_list entry)."""
+
+    def __init__(self, key_id: str, config: Dict[str, Any], requests_per_minute: float, tokens_per_minute: float):
+        self.key_id = key_id
+        self.config = config
+        self.label = f"{config.get('base_url', 'default')} ...{str(config.get('api_key', ''))[-4:]}"
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self.cooldown_until = 0.0
+        self.consecutive_failures = 0
+        self.total_requests = 0
+        self.total_failures = 0
+
+    def wait_time(self, estimated_tokens: int, now: float) -> float:
+        return max(
+            self.cooldown_until - now,
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(estimated_tokens, now),
+        )
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """Parse rate-limit reset values such as ``"7.66s"``, ``"2m59.56s"``,
+    ``"1h2m"``, ``"850ms"``, plain seconds, or an HTTP date."""
+    value = str(value).strip()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if parts and "".join(n + u for n, u in parts) == value.replace(" ", ""):
+        scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+        return sum(float(n) * scale[u] for n, u in parts)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_after_from_error(error: Exception) -> Optional[float]:
+    """Longest reset time advertised by the provider's response headers."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    candidates = []
+    if headers.get("retry-after-ms"):
+        ms = parse_duration(headers["retry-after-ms"])
+        if ms is not None:
+            candidates.append(ms / 1000.0)
+    for name in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        if headers.get(name):
+            seconds = parse_duration(headers[name])
+            if seconds is not None:
+                candidates.append(seconds)
+    return max(candidates) if candidates else None
+
+
+def classify_error(error: Exception) -> str:
+    """Return ``"rate_limit"``, ``"auth"``, ``"transient"`` or ``"other"``."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    message = str(error).lower()
+    if status == 429 or type(error).__name__ == "RateLimitError" or "rate limit" in message or "429" in message:
+        return "rate_limit"
+    if status in (401, 403) or type(error).__name__ in ("AuthenticationError", "PermissionDeniedError"):
+        return "auth"
+    if (status is not None and status >= 500) or type(error).__name__ in ("APIConnectionError", "APITimeoutError"):
+        return "transient"
+    return "other"
+
+
+def tier_of(config: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """Entries with the same endpoint and model are interchangeable."""
+    return config.get("base_url"), config.get("model")
+
+
+def key_id_for(config: Dict[str, Any]) -> str:
+    raw = json.dumps([config.get("base_url"), config.get("model"), config.get("api_key")])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class KeyPool:
+    """Spreads LLM calls across the keys of a config_list.
+
+    Each key has a request and a token bucket. Keys that hit a rate limit are
+    put in cooldown for as long as the provider's Retry-After / reset
+    headers say (or an exponential backoff when there are none).
+
+    Entries are grouped into tiers by (base_url, model), in config_list
+    order. Calls rotate round-robin over the keys of the first tier that
+    has one with budget; later tiers (e.g. a smaller fallback model) are
+    only used while every key of the earlier ones is exhausted.
+    """
+
+    def __init__(self, requests_per_minute: float = 30, tokens_per_minute: float = 12000,
+                 max_wait: float = 60.0, base_cooldown: float = 20.0, max_cooldown: float = 600.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_wait = max_wait
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self._keys: Dict[str, KeyState] = {}
+        self._clients: Dict[tuple, Any] = {}
+        self._cursors: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, config: Dict[str, Any]) -> KeyState:
+        key_id = key_id_for(config)
+        state = self._keys.get(key_id)
+        if state is None:
+            state = KeyState(key_id, config, self.requests_per_minute, self.tokens_per_minute)
+            self._keys[key_id] = state
+        return state
+
+    def acquire(self, config_list: List[Dict[str, Any]], estimated_tokens: int = 0) -> KeyState:
+        """Reserve budget on the next healthy key, waiting up to ``max_wait``
+        seconds for one to become available."""
+        if not config_list:
+            raise ValueError("Empty config_list")
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tiers: Dict[tuple, List[KeyState]] = {}
+                for config in config_list:
+                    tiers.setdefault(tier_of(config), []).append(self._state(config))
+                count = len(config_list)
+                waits = []
+                for tier, states in tiers.items():
+                    cursor = self._cursors.get(tier, 0)
+                    for offset in range(len(states)):
+                        state = states[(cursor + offset) % len(states)]
+                        wait = state.wait_time(estimated_tokens, now)
+                        if wait <= 0:
+                            self._cursors[tier] = (cursor + offset + 1) % len(states)
+                            state.requests.take(1, now)
+                            state.tokens.take(estimated_tokens, now)
+                            state.total_requests += 1
+                            return state
+                        waits.append(wait)
+                shortest = min(waits)
+            if now + shortest > deadline:
+                raise KeyPoolExhausted(
+                    f"All {count} LLM API key(s) are rate limited; "
+                    f"next one frees up in {shortest:.0f}s. Rate limit reached."
+                )
+            time.sleep(min(shortest, 1.0))
+
+    def report_success(self, state: KeyState, tokens_used: int = 0, estimated_tokens: int = 0):
+        with self._lock:
+            state.consecutive_failures = 0
+            # Settle the token reservation made in acquire().
+            now = time.monotonic()
+            if tokens_used > estimated_tokens:
+                state.tokens.take(tokens_used - estimated_tokens, now)
+            else:
+                state.tokens.give_back(estimated_tokens - tokens_used, now)
+
+    def report_failure(self, state: KeyState, error: Exception) -> bool:
+        """Record a failed call. Returns True when another key should be tried."""
+        kind = classify_error(error)
+        with self._lock:
+            state.total_failures += 1
+            state.consecutive_failures += 1
+            now = time.monotonic()
+            if kind == "rate_limit":
+                cooldown = retry_after_from_error(error)
+                if cooldown is None:
+                    cooldown = self.base_cooldown * (2 ** (state.consecutive_failures - 1))
+                state.cooldown_until = now + min(cooldown, self.max_cooldown)
+                state.requests.drain()
+            elif kind == "auth":
+                state.cooldown_until = now + self.max_cooldown
+            elif kind == "transient":
+                state.cooldown_until = now + min(self.base_cooldown, self.max_cooldown)
+            else:
+                return False
+            seconds = state.cooldown_until - now
+        logger.warning(f"LLM key {state.label} ({kind}) cooling down for {seconds:.0f}s")
+        return True
+
+    def client_for(self, state: KeyState, llm_config: Dict[str, Any], **overrides):
+        """An OpenAIWrapper bound to this single key, reused across calls.
+
+        The OpenAI SDK's own retries are disabled so a rate-limited key
+        fails fast and the pool can move on to the next one.
+        """
+        params = {k: v for k, v in llm_config.items() if k != "config_list"}
+        params.update(overrides)
+        cache_key = (state.key_id, json.dumps(params, sort_keys=True, default=str))
+        with self._lock:
+            client = self._clients.get(cache_key)
+        if client is None:
+            from autogen import OpenAIWrapper
+            config = dict(state.config)
+            config.setdefault("max_retries", 0)
+            client = OpenAIWrapper(config_list=[config], **params)
+            with self._lock:
+                client = self._clients.setdefault(cache_key, client)
+        return client
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "key": state.label,
+                    "model": state.config.get("model"),
+                    "cooldown_seconds": max(0.0, round(state.cooldown_until - now, 1)),
+                    "requests": state.total_requests,
+                    "failures": state.total_failures,
+                }
+                for state in self._keys.values()
+            ]
+
+
+_default_pool: Optional[KeyPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_key_pool() -> KeyPool:
+    """Process-wide pool, so key health and budgets carry over between runs.
+
+    Budgets come from KEY_POOL_RPM, KEY_POOL_TPM and KEY_POOL_MAX_WAIT.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            config = get_config_provider()
+            _default_pool = KeyPool(
+                requests_per_minute=float(config.get("KEY_POOL_RPM", "30")),
+                tokens_per_minute=float(config.get("KEY_POOL_TPM", "12000")),
+                max_wait=float(config.get("KEY_POOL_MAX_WAIT", "60")),
+            )
+        return _default_pool
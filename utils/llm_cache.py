@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Any, Optional, List
+from utils.config import get_config_provider
+
+CACHE_MODES = ("off", "read_write", "replay")
+
+
+class CacheMissError(RuntimeError):
+    """Raised in replay mode when a request has no cached response."""
+
+
+class ResponseCache:
+    """Content-addressed store of LLM replies backed by SQLite.
+
+    Modes:
+    - ``off``: never read or write.
+    - ``read_write``: serve hits, store misses (default).
+    - ``replay``: serve hits, raise CacheMissError on a miss instead of
+      calling the provider. Useful for offline, deterministic reruns.
+
+    Once the stored replies exceed ``max_bytes`` the least recently used
+    entries are evicted.
+    """
+
+    def __init__(self, path: str = ".llm_cache.sqlite3", max_bytes: int = 256 * 1024 * 1024, mode: str = "read_write"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode: {mode!r} (expected one of {', '.join(CACHE_MODES)})")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    @staticmethod
+    def make_key(agent_name: str, system_message: str, model: str, temperature: Any,
+                 messages: List[Dict[str, Any]]) -> str:
+        context = hashlib.sha256(
+            json.dumps(
+                [[m.get("role", ""), m.get("content", "")] for m in messages],
+                ensure_ascii=False,
+            ).encode("utf-8")
+        ).hexdigest()
+        raw = json.dumps([agent_name, system_message, model, temperature, context], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+                conn.commit()
+        if row is None and self.mode == "replay":
+            raise CacheMissError(f"No cached LLM response for key {key[:12]} (replay mode)")
+        return row[0] if row else None
+
+    def put(self, key: str, agent_name: str, response: str):
+        if self.mode != "read_write":
+            return
+        size = len(response.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, agent, response, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, agent_name, response, size, now, now),
+            )
+            self._evict(conn)
+            conn.commit()
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            conn = self._connect()
+            entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"mode": self.mode, "entries": entries, "bytes": total, "hits": self.hits, "misses": self.misses}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, agent TEXT, response TEXT NOT NULL, "
+                "size INTEGER NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+            self._conn.commit()
+        return self._conn
+
+    def _evict(self, conn: sqlite3.Connection):
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+
+
+_default_cache: Optional[ResponseCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide cache configured from LLM_CACHE_MODE, LLM_CACHE_PATH and
+    LLM_CACHE_MAX_MB."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            config = get_config_provider()
+            _default_cache = ResponseCache(
+                path=config.get("LLM_CACHE_PATH", ".llm_cache.sqlite3"),
+                max_bytes=int(float(config.get("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024),
+                mode=config.get("LLM_CACHE_MODE", "read_write"),
+            )
+        return _default_cache
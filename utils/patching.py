@@ -0,0 +1,116 @@
+import re
+from typing import Dict, List, Tuple
+
+BEGIN_PATCH_PATTERN = re.compile(r"^===BEGIN_PATCH\s*:\s*([^\n=]+?)\s*===\s*$")
+END_PATCH_MARKER = "===END_PATCH==="
+SEARCH_MARKER = "<<<<<<< SEARCH"
+DIVIDER_MARKER = "======="
+REPLACE_MARKER = ">>>>>>> REPLACE"
+
+PATCH_INSTRUCTIONS = """REVISION MODE: main.py already exists (above). Do NOT rewrite the whole file.
+Reply only with search/replace edits that fix the review issues, in this exact format:
+
+===BEGIN_PATCH:main.py===
+<<<<<<< SEARCH
+exact lines copied from the current main.py
+=======
+the lines that replace them
+>>>>>>> REPLACE
+===END_PATCH===
+
+Rules:
+- Put as many SEARCH/REPLACE blocks as needed inside one BEGIN_PATCH/END_PATCH block.
+- Each SEARCH must match exactly one place in the current main.py; include enough surrounding lines to make it unique.
+- Copy SEARCH lines exactly, including indentation.
+- To add code, SEARCH for nearby lines and repeat them in REPLACE together with the new code.
+- If the fix requires changing most of the file, return the complete file in the usual ===BEGIN_FILE:main.py=== format instead."""
+
+
+class PatchConflict(ValueError):
+    """A search/replace edit does not apply cleanly to the current file."""
+
+
+def parse_patches(text: str) -> Dict[str, List[Tuple[str, str]]]:
+    """Search/replace hunks per file from ===BEGIN_PATCH:name=== blocks.
+
+    Raises PatchConflict for blocks that are malformed or contain no
+    SEARCH/REPLACE edits (e.g. a unified diff), since applying half of an
+    edit, or none of it, would be worse than asking for a rewrite.
+    """
+    patches: Dict[str, List[Tuple[str, str]]] = {}
+    filename = None
+    state = None
+    search: List[str] = []
+    replace: List[str] = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if filename is None:
+            match = BEGIN_PATCH_PATTERN.match(stripped)
+            if match:
+                filename = match.group(1).strip()
+                patches.setdefault(filename, [])
+            continue
+        if stripped == END_PATCH_MARKER:
+            if state is not None:
+                raise PatchConflict(f"Unterminated SEARCH/REPLACE block in patch for {filename}")
+            if not patches[filename]:
+                raise PatchConflict(f"Patch for {filename} contains no SEARCH/REPLACE edits")
+            filename = None
+        elif state is None:
+            if stripped == SEARCH_MARKER:
+                state, search, replace = "search", [], []
+        elif state == "search":
+            if stripped == DIVIDER_MARKER:
+                state = "replace"
+            else:
+                search.append(line)
+        elif state == "replace":
+            if stripped == REPLACE_MARKER:
+                patches[filename].append(("\n".join(search), "\n".join(replace)))
+                state = None
+            else:
+                replace.append(line)
+    if state is not None:
+        raise PatchConflict(f"Unterminated SEARCH/REPLACE block in patch for {filename}")
+    empty = [name for name, hunks in patches.items() if not hunks]
+    if empty:
+        raise PatchConflict(f"Patch for {empty[0]} contains no SEARCH/REPLACE edits")
+    return patches
+
+
+def _find_lines(lines: List[str], search_lines: List[str], normalize) -> List[int]:
+    """Start indices where ``search_lines`` match as whole lines."""
+    wanted = [normalize(line) for line in search_lines]
+    width = len(wanted)
+    candidates = [normalize(line) for line in lines]
+    first = wanted[0]
+    return [
+        start for start in range(len(candidates) - width + 1)
+        if candidates[start] == first and candidates[start:start + width] == wanted
+    ]
+
+
+def apply_search_replace(source: str, hunks: List[Tuple[str, str]]) -> str:
+    """Apply hunks in order. Each search block must match exactly one run
+    of whole lines in the file as edited so far; otherwise PatchConflict
+    says which hunk failed and why, and nothing is applied."""
+    lines = source.split("\n")
+    for number, (search, replace) in enumerate(hunks, start=1):
+        if not search.strip():
+            raise PatchConflict(f"Edit {number} has an empty SEARCH block")
+        search_lines = search.split("\n")
+        starts = _find_lines(lines, search_lines, lambda line: line)
+        if len(starts) != 1:
+            # Models often get trailing whitespace wrong; retry without it
+            starts = _find_lines(lines, search_lines, str.rstrip)
+        if len(starts) != 1:
+            first_line = search_lines[0].strip()[:80]
+            if starts:
+                raise PatchConflict(
+                    f"Edit {number}: SEARCH block starting {first_line!r} matches {len(starts)} places; "
+                    f"include more context"
+                )
+            raise PatchConflict(f"Edit {number}: SEARCH block starting {first_line!r} not found in the current file")
+        start = starts[0]
+        lines[start:start + len(search_lines)] = replace.split("\n") if replace else []
+    return "\n".join(lines)
@@ -0,0 +1,136 @@
+import os
+import ast
+import sys
+import pkgutil
+import builtins
+import sysconfig
+from typing import List, Iterable, Optional
+
+# Names every module has without binding them
+MODULE_NAMES = {
+    "__name__", "__file__", "__doc__", "__spec__", "__loader__", "__package__",
+    "__builtins__", "__path__", "__annotations__", "__class__", "__debug__",
+}
+
+# Names a class body has without binding them
+CLASS_NAMES = {"__module__", "__qualname__"}
+
+BUILTIN_NAMES = set(dir(builtins)) | MODULE_NAMES
+
+# Scopes nested in a class body that don't see its implicit names
+NESTED_SCOPES = (
+    ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda,
+    ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp,
+)
+
+# Pattern-matching nodes only exist on Python 3.10+
+MATCH_CAPTURE_NODES = tuple(getattr(ast, name) for name in ("MatchAs", "MatchStar") if hasattr(ast, name))
+MATCH_MAPPING_NODES = tuple(getattr(ast, name) for name in ("MatchMapping",) if hasattr(ast, name))
+
+
+def _stdlib_modules() -> set:
+    names = set(sys.builtin_module_names) | {"__future__"}
+    if hasattr(sys, "stdlib_module_names"):
+        return names | set(sys.stdlib_module_names)
+    # Python < 3.10: list what is installed in the standard library directories
+    paths = sysconfig.get_paths()
+    directories = [paths["stdlib"], paths["platstdlib"]]
+    directories += [os.path.join(directory, "lib-dynload") for directory in directories]
+    return names | {module.name for module in pkgutil.iter_modules(directories)}
+
+
+STDLIB_MODULES = _stdlib_modules()
+
+
+def _bound_names(tree: ast.AST) -> set:
+    """Every name the module binds anywhere, in any scope."""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                names.add((alias.asname or alias.name).split(".")[0])
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+        elif isinstance(node, MATCH_CAPTURE_NODES) and node.name:
+            names.add(node.name)
+        elif isinstance(node, MATCH_MAPPING_NODES) and node.rest:
+            names.add(node.rest)
+    return names
+
+
+def _class_body_names(tree: ast.AST) -> set:
+    """ids of the Name nodes evaluated directly in a class body's scope."""
+    found = set()
+
+    def visit(node: ast.AST):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.Name):
+                found.add(id(child))
+            if not isinstance(child, NESTED_SCOPES):
+                visit(child)
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef):
+            for statement in node.body:
+                if isinstance(statement, ast.Name):
+                    found.add(id(statement))
+                if not isinstance(statement, NESTED_SCOPES):
+                    visit(statement)
+    return found
+
+
+def check_python_source(source: str, filename: str = "main.py",
+                        local_modules: Optional[Iterable[str]] = None) -> List[str]:
+    """Problems in ``source`` that are certain without running it: syntax
+    errors, imports outside the standard library (and ``local_modules``),
+    and names that are used but never bound anywhere in the module.
+
+    The undefined-name check ignores scoping on purpose, so it only reports
+    names that cannot resolve in any scope and never false-alarms on valid
+    code. It is skipped for modules using ``from x import *``.
+    """
+    try:
+        tree = ast.parse(source, filename=filename)
+    except SyntaxError as e:
+        return [f"{filename} line {e.lineno}: SyntaxError: {e.msg}"]
+
+    allowed = STDLIB_MODULES | set(local_modules or ())
+    issues = []
+    star_import = False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            modules = [node.module]
+            star_import = star_import or any(alias.name == "*" for alias in node.names)
+        else:
+            continue
+        for module in modules:
+            top = module.split(".")[0]
+            if top not in allowed:
+                issues.append(
+                    (node.lineno, f"{filename} line {node.lineno}: imports third-party package '{top}'; "
+                                  f"only the Python standard library may be used")
+                )
+
+    if not star_import:
+        bound = _bound_names(tree) | BUILTIN_NAMES
+        class_body = _class_body_names(tree)
+        reported = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+                if node.id in CLASS_NAMES and id(node) in class_body:
+                    continue
+                if node.id not in bound and node.id not in reported:
+                    reported.add(node.id)
+                    issues.append((node.lineno, f"{filename} line {node.lineno}: name '{node.id}' is not defined"))
+
+    return [message for _, message in sorted(issues)]
@@ -1,16 +1,334 @@
 import subprocess
 import sys
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import json
 import tempfile
+import time
+import signal
+import dis
+import inspect
+import hashlib
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from utils.logger import setup_logger
+from utils.test_runner import BoundedOutput, capture_output
+
+logger = setup_logger()
+
+
+def available_cpus() -> int:
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+TEST_RUNNER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_runner.py')
+
+# Outcomes written by utils/test_runner.py, grouped into the counters we report
+OUTCOME_COUNTERS = {
+    'passed': 'passed',
+    'xfail': 'passed',
+    'failed': 'failures',
+    'xpass': 'failures',
+    'error': 'errors',
+    'timeout': 'errors',
+    'skipped': 'skipped',
+}
+
+# Worst first, for merging the status of a file's shards
+STATUS_PRECEDENCE = ['error', 'timeout', 'failed', 'passed']
+
+
+def default_test_limits() -> Dict[str, int]:
+    """Resource limits for test processes from TEST_LIMIT_MEMORY_MB,
+    TEST_LIMIT_CPU_SECONDS, TEST_LIMIT_OPEN_FILES and TEST_LIMIT_PROCESSES
+    (0 leaves a limit unset)."""
+    from utils.config import get_config_provider
+    config = get_config_provider()
+    return {
+        'memory': int(float(config.get('TEST_LIMIT_MEMORY_MB', '1024')) * 1024 * 1024),
+        'cpu': int(config.get('TEST_LIMIT_CPU_SECONDS', '30')),
+        'open_files': int(config.get('TEST_LIMIT_OPEN_FILES', '256')),
+        'processes': int(config.get('TEST_LIMIT_PROCESSES', '512')),
+    }
+
+
+def default_max_output() -> int:
+    from utils.config import get_config_provider
+    return int(float(get_config_provider().get('TEST_OUTPUT_MAX_KB', '256')) * 1024)
+
+
+@functools.lru_cache(maxsize=None)
+def pytest_available() -> bool:
+    """Whether pytest can be imported by sys.executable; checked once per process."""
+    result = subprocess.run(
+        [sys.executable, '-c', 'import pytest'],
+        capture_output=True,
+        env=dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    )
+    return result.returncode == 0
+
+
+def read_test_records(path: str, coverage: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Per-test records written by the runner. Coverage lines, if any, are
+    merged into ``coverage`` when it is given."""
+    tests = []
+    if not os.path.exists(path):
+        return tests
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Last record cut short by a crash or timeout
+                break
+            if 'coverage' in record:
+                if coverage is not None:
+                    merge_coverage_data(coverage, record['coverage'])
+            else:
+                tests.append(record)
+    return tests
+
+
+def merge_coverage_data(into: Dict[str, Any], data: Dict[str, Any]):
+    for name, executed in data.items():
+        entry = into.setdefault(name, {'lines': [], 'functions': []})
+        entry['lines'] = sorted(set(entry['lines']) | set(executed['lines']))
+        entry['functions'] = sorted(
+            {tuple(f) for f in entry['functions']} | {tuple(f) for f in executed['functions']}
+        )
+
+
+def _code_lines(code):
+    """Line numbers with bytecode in ``code`` itself (not nested code)."""
+    if hasattr(code, 'co_lines'):
+        return {line for _, _, line in code.co_lines() if line}
+    # Python < 3.10
+    return {line for _, line in dis.findlinestarts(code) if line}
+
+
+def _code_objects(code):
+    yield code
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            yield from _code_objects(const)
+
+
+def summarize_coverage(workspace_path: str, executed: Dict[str, Any], test_files: List[str]) -> Dict[str, Any]:
+    """Line and function coverage of the workspace's non-test modules.
+    
+    Executable lines and functions come from compiling each module, so
+    modules the tests never imported are reported at 0%.
+    """
+    workspace = Path(workspace_path)
+    test_files = {os.path.abspath(f) for f in test_files}
+    files = {}
+    for path in sorted(workspace.rglob('*.py')):
+        if '__pycache__' in path.parts or os.path.abspath(path) in test_files:
+            continue
+        name = path.relative_to(workspace).as_posix()
+        try:
+            module = compile(path.read_bytes(), str(path), 'exec', dont_inherit=True)
+        except (SyntaxError, ValueError):
+            continue
+        lines = set()
+        functions = {}
+        for code in _code_objects(module):
+            lines.update(_code_lines(code))
+            # Skip module and class bodies, lambdas and comprehensions
+            if code.co_flags & inspect.CO_OPTIMIZED and not code.co_name.startswith('<'):
+                functions[(code.co_firstlineno, code.co_name)] = getattr(code, 'co_qualname', code.co_name)
+        ran = executed.get(name, {})
+        covered_lines = lines & set(ran.get('lines', ()))
+        called = {tuple(f) for f in ran.get('functions', ())}
+        files[name] = {
+            'lines_total': len(lines),
+            'lines_covered': len(covered_lines),
+            'missing_lines': sorted(lines - covered_lines),
+            'functions_total': len(functions),
+            'functions_covered': sum(1 for key in functions if key in called),
+            'missing_functions': [qualname for key, qualname in sorted(functions.items()) if key not in called],
+        }
+    
+    def percent(covered, total):
+        return round(100.0 * covered / total, 1) if total else 100.0
+    
+    for entry in files.values():
+        entry['line_percent'] = percent(entry['lines_covered'], entry['lines_total'])
+        entry['function_percent'] = percent(entry['functions_covered'], entry['functions_total'])
+    return {
+        'line_percent': percent(sum(f['lines_covered'] for f in files.values()),
+                                sum(f['lines_total'] for f in files.values())),
+        'function_percent': percent(sum(f['functions_covered'] for f in files.values()),
+                                    sum(f['functions_total'] for f in files.values())),
+        'files': files,
+    }
+
+
+def summarize_tests(tests: List[Dict[str, Any]]) -> Dict[str, int]:
+    summary = {'tests_run': len(tests), 'passed': 0, 'failures': 0, 'errors': 0, 'skipped': 0}
+    for test in tests:
+        summary[OUTCOME_COUNTERS.get(test.get('outcome'), 'errors')] += 1
+    return summary
+
+
+def merge_shard_results(shard_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    merged = {
+        'status': min((r['status'] for r in shard_results), key=STATUS_PRECEDENCE.index),
+        'tests': [],
+        'output': '\n'.join(r['output'] for r in shard_results),
+        'return_code': max((r['return_code'] for r in shard_results), key=abs),
+        'file': shard_results[0]['file'],
+    }
+    for counter in ('tests_run', 'passed', 'failures', 'errors', 'skipped'):
+        merged[counter] = sum(r[counter] for r in shard_results)
+    coverage_data = {}
+    for result in shard_results:
+        merged['tests'].extend(result['tests'])
+        merge_coverage_data(coverage_data, result.get('coverage_data', {}))
+    merged['coverage_data'] = coverage_data
+    return merged
+
+
+def workspace_fingerprint(workspace_path: str, options: str = '') -> str:
+    """Hash of every Python file in the workspace, the interpreter version,
+    the result runner and ``options``, i.e. everything that decides a test
+    run's outcome."""
+    digest = hashlib.sha256()
+    digest.update(sys.version.encode('utf-8'))
+    digest.update(options.encode('utf-8'))
+    with open(TEST_RUNNER, 'rb') as f:
+        digest.update(hashlib.sha256(f.read()).digest())
+    workspace = Path(workspace_path)
+    for path in sorted(workspace.rglob('*.py')):
+        if '__pycache__' in path.parts:
+            continue
+        digest.update(path.relative_to(workspace).as_posix().encode('utf-8') + b'\0')
+        digest.update(hashlib.sha256(path.read_bytes()).digest())
+    return digest.hexdigest()
+
+
+class TestResultCache:
+    """Stores execute_all_tests() results on disk by workspace fingerprint.
+    
+    Runs where a file or a single test hit a timeout, or the executor
+    failed, are not stored, since they may pass on the next attempt. Only
+    the newest ``max_entries`` results are kept.
+    """
+    
+    def __init__(self, directory: str = '.test_cache', max_entries: int = 200):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.json')
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Keep recently used entries from being evicted first
+        os.utime(path)
+        return result
+    
+    def put(self, key: str, result: Dict[str, Any]):
+        for file_result in result.get('test_results', []):
+            if file_result.get('status') in ('timeout', 'error'):
+                return
+            if any(t.get('outcome') == 'timeout' for t in file_result.get('tests', [])):
+                return
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.result-')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(result, f)
+            os.replace(tmp_path, self._path(key))
+            self._evict()
+    
+    def _evict(self):
+        entries = [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith('.json')
+        ]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+_default_cache: Optional[TestResultCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_test_result_cache() -> Optional[TestResultCache]:
+    """Process-wide cache rooted at TEST_CACHE_DIR (default ``.test_cache``);
+    an empty TEST_CACHE_DIR disables it."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            from utils.config import get_config_provider
+            directory = get_config_provider().get('TEST_CACHE_DIR', '.test_cache')
+            if not directory:
+                return None
+            _default_cache = TestResultCache(directory)
+        return _default_cache
 
 
 class TestExecutor:
     
-    def __init__(self, workspace_path: str):
+    def __init__(self, workspace_path: str, parallel: bool = True, max_workers: int = None, use_pool: bool = True,
+                 use_cache: bool = True, force: bool = False, test_timeout: float = 10,
+                 file_timeout: int = 30, shard: bool = True, limits: Optional[Dict[str, int]] = None,
+                 max_output: Optional[int] = None, coverage: Optional[bool] = None):
         self.workspace_path = workspace_path
+        self.parallel = parallel
+        self.use_pool = use_pool
+        self.use_cache = use_cache
+        # force skips cache lookups but still stores the fresh result
+        self.force = force
+        # Seconds allowed per test method, and per runner process
+        self.test_timeout = test_timeout
+        self.file_timeout = file_timeout
+        self.shard = shard
+        # Generated code is untrusted: cap what each test process may use,
+        # and how much of its output we keep (first and last half)
+        self.limits = default_test_limits() if limits is None else limits
+        self.max_output = default_max_output() if max_output is None else max_output
+        if coverage is None:
+            from utils.config import get_config_provider
+            # Before Python 3.12 coverage falls back to sys.settrace, which
+            # slows tests down enough to hit the timeouts and CPU limit; only
+            # use it there when TEST_COVERAGE asks for it
+            default = 'on' if hasattr(sys, 'monitoring') else 'off'
+            coverage = get_config_provider().get('TEST_COVERAGE', default).lower() not in ('0', 'off', 'false', 'no')
+        self.coverage = coverage
+        # Each test file runs in its own interpreter, so the pool only needs
+        # threads to wait on the subprocesses; size it to the available cores.
+        self.max_workers = max_workers or available_cpus()
+    
+    def cache_options(self) -> str:
+        """The settings that can change a run's outcome, for the result cache key."""
+        return json.dumps({
+            'test_timeout': self.test_timeout,
+            'file_timeout': self.file_timeout,
+            'limits': self.limits,
+            'max_output': self.max_output,
+            'shards': self.max_workers if self.shard else 1,
+            'coverage': self.coverage,
+            'pytest': pytest_available(),
+        }, sort_keys=True)
     
     def find_test_files(self) -> List[str]:
         test_files = []
@@ -19,204 +337,189 @@ class TestExecutor:
         if workspace.exists():
             # Look for test files (test_*.py, *_test.py, test_suite.py)
             for pattern in ['test_*.py', '*_test.py', 'test_suite.py']:
-                test_files.extend(workspace.glob(pattern))
+                test_files.extend(sorted(workspace.glob(pattern)))
         
-        return [str(f) for f in test_files]
+        # test_suite.py also matches test_*.py; keep the first occurrence only
+        return list(dict.fromkeys(str(f) for f in test_files))
     
-    def execute_unittest_file(self, test_file: str) -> Dict[str, Any]:
+    def _launch(self, runner_args: List[str], timeout: int):
+        """Run utils/test_runner.py in the workspace and return (return_code, output).
+        
+        Uses a warm worker from the test pool when possible and a fresh
+        interpreter otherwise. Raises subprocess.TimeoutExpired on timeout.
+        """
+        cwd = os.path.abspath(self.workspace_path)
+        if self.limits:
+            runner_args = ['--limits', json.dumps(self.limits)] + runner_args
+        pool = None
+        if self.use_pool:
+            from utils.test_pool import get_test_worker_pool
+            pool = get_test_worker_pool()
+        if pool is not None:
+            from utils.test_pool import TestWorkerError
+            try:
+                reply = pool.run(cwd, runner_args, timeout=timeout, max_output=self.max_output)
+            except TestWorkerError as e:
+                logger.warning(f"Test worker failed, running in a new interpreter: {e}")
+            else:
+                if reply['timed_out']:
+                    raise subprocess.TimeoutExpired(runner_args, timeout)
+                return reply['return_code'], reply['output']
+        
+        # Prepare environment to prevent __pycache__ creation
+        env = os.environ.copy()
+        env['PYTHONDONTWRITEBYTECODE'] = '1'
+        
+        proc = subprocess.Popen(
+            [sys.executable, TEST_RUNNER] + runner_args,
+            cwd=cwd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+            env=env
+        )
+        output = BoundedOutput(self.max_output)
         try:
-            # Extract just the filename (without extension) for unittest module import
-            test_filename = os.path.basename(test_file)
-            test_module = test_filename.replace('.py', '')
-            
-            # Prepare environment to prevent __pycache__ creation
-            env = os.environ.copy()
-            env['PYTHONDONTWRITEBYTECODE'] = '1'
-            
-            # Run the test file with unittest in verbose mode
-            result = subprocess.run(
-                [sys.executable, '-m', 'unittest', test_module, '-v'],
-                cwd=self.workspace_path,
-                capture_output=True,
-                text=True,
-                timeout=30,  # 30 second timeout
-                env=env
+            finished = capture_output(
+                proc.stdout.fileno(), output, lambda: proc.poll() is not None, time.monotonic() + timeout
             )
-            
-            # Parse the output
-            output = result.stdout + result.stderr
-            
-            # Extract test counts
-            tests_run = 0
-            failures = 0
-            errors = 0
-            skipped = 0
-            
-            # Parse unittest output for test counts
-            for line in output.split('\n'):
-                if 'Ran' in line and 'test' in line:
-                    # Extract number of tests run
-                    parts = line.split()
-                    for i, part in enumerate(parts):
-                        if 'Ran' == part and i + 1 < len(parts):
-                            try:
-                                tests_run = int(parts[i + 1])
-                            except (ValueError, IndexError):
-                                pass
-                
-                if 'FAILED' in line:
-                    # Extract failures and errors
-                    if 'failures=' in line:
-                        try:
-                            failures = int(line.split('failures=')[1].split(')')[0].split(',')[0])
-                        except (ValueError, IndexError):
-                            pass
-                    if 'errors=' in line:
-                        try:
-                            errors = int(line.split('errors=')[1].split(')')[0].split(',')[0])
-                        except (ValueError, IndexError):
-                            pass
-            
-            # Determine overall status
-            if result.returncode == 0:
-                status = 'passed'
-            else:
-                status = 'failed'
-            
-            return {
-                'status': status,
-                'tests_run': tests_run,
-                'failures': failures,
-                'errors': errors,
-                'skipped': skipped,
-                'output': output,
-                'return_code': result.returncode,
-                'file': os.path.basename(test_file)
-            }
-            
+        finally:
+            proc.stdout.close()
+            # Take down anything the tests left running, and the runner on timeout
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+            proc.wait()
+        if not finished:
+            raise subprocess.TimeoutExpired(runner_args, timeout)
+        return proc.returncode, output.getvalue()
+    
+    def list_tests(self, test_module: str) -> List[str]:
+        """Ids of the module's tests, or [] if they cannot be run one by one."""
+        fd, ids_path = tempfile.mkstemp(prefix='test-ids-', suffix='.jsonl')
+        os.close(fd)
+        try:
+            return_code, _ = self._launch(['--json-out', ids_path, '--list', test_module], self.file_timeout)
+            if return_code != 0:
+                return []
+            return [record['id'] for record in read_test_records(ids_path)]
         except subprocess.TimeoutExpired:
-            return {
-                'status': 'timeout',
-                'tests_run': 0,
-                'failures': 0,
-                'errors': 1,
-                'skipped': 0,
-                'output': f'Test execution timed out after 30 seconds',
-                'return_code': -1,
-                'file': os.path.basename(test_file)
-            }
-        except Exception as e:
-            return {
-                'status': 'error',
-                'tests_run': 0,
-                'failures': 0,
-                'errors': 1,
-                'skipped': 0,
-                'output': f'Error executing tests: {str(e)}',
-                'return_code': -1,
-                'file': os.path.basename(test_file)
-            }
+            return []
+        finally:
+            try:
+                os.unlink(ids_path)
+            except OSError:
+                pass
     
-    def execute_pytest_file(self, test_file: str) -> Dict[str, Any]:
+    def _run_with_runner(self, test_file: str, runner_args: List[str],
+                         expected_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        fd, records_path = tempfile.mkstemp(prefix='test-results-', suffix='.jsonl')
+        os.close(fd)
+        coverage_args = ['--coverage'] if self.coverage else []
+        coverage_data = {}
         try:
-            # Prepare environment to prevent __pycache__ creation
-            env = os.environ.copy()
-            env['PYTHONDONTWRITEBYTECODE'] = '1'
-            
-            # Check if pytest is available
-            pytest_check = subprocess.run(
-                [sys.executable, '-m', 'pytest', '--version'],
-                capture_output=True,
-                text=True,
-                env=env
-            )
+            try:
+                return_code, output = self._launch(
+                    ['--json-out', records_path] + coverage_args + runner_args, self.file_timeout
+                )
+            except subprocess.TimeoutExpired:
+                # Tests that finished before the timeout are still reported,
+                # and the ones that never got to run count as timed out
+                tests = read_test_records(records_path, coverage_data)
+                seen = {t['id'] for t in tests}
+                for test_id in expected_ids or []:
+                    if test_id not in seen:
+                        tests.append({'id': test_id, 'outcome': 'timeout', 'duration': 0.0, 'traceback': None})
+                summary = summarize_tests(tests)
+                if not expected_ids:
+                    summary['errors'] += 1
+                return dict(
+                    summary,
+                    status='timeout',
+                    tests=tests,
+                    coverage_data=coverage_data,
+                    output=f'Test execution timed out after {self.file_timeout} seconds',
+                    return_code=-1,
+                    file=os.path.basename(test_file)
+                )
             
-            if pytest_check.returncode != 0:
-                # Pytest not available, fall back to unittest
-                return self.execute_unittest_file(test_file)
+            tests = read_test_records(records_path, coverage_data)
+            if return_code < 0:
+                # Killed by a signal, e.g. SIGXCPU from the CPU limit
+                try:
+                    signal_name = signal.Signals(-return_code).name
+                except ValueError:
+                    signal_name = f'signal {-return_code}'
+                output += f'\nTest process was killed by {signal_name}'
+                seen = {t['id'] for t in tests}
+                for test_id in expected_ids or []:
+                    if test_id not in seen:
+                        tests.append({'id': test_id, 'outcome': 'error', 'duration': 0.0,
+                                      'traceback': f'Test process was killed by {signal_name}'})
+            summary = summarize_tests(tests)
+            if return_code != 0 and not summary['failures'] and not summary['errors']:
+                # The runner itself failed (syntax error, missing import...)
+                summary['errors'] = 1
             
-            # Run pytest with JSON report
-            result = subprocess.run(
-                [sys.executable, '-m', 'pytest', test_file, '-v', '--tb=short'],
-                cwd=self.workspace_path,
-                capture_output=True,
-                text=True,
-                timeout=30,
-                env=env
+            return dict(
+                summary,
+                status='passed' if return_code == 0 else 'failed',
+                tests=tests,
+                coverage_data=coverage_data,
+                output=output,
+                return_code=return_code,
+                file=os.path.basename(test_file)
             )
             
-            output = result.stdout + result.stderr
-            
-            # Parse pytest output
-            tests_run = 0
-            failures = 0
-            errors = 0
-            skipped = 0
-            
-            for line in output.split('\n'):
-                if 'passed' in line or 'failed' in line:
-                    # Extract test counts from pytest summary
-                    if 'passed' in line:
-                        try:
-                            passed_count = int(line.split('passed')[0].strip().split()[-1])
-                            tests_run += passed_count
-                        except (ValueError, IndexError):
-                            pass
-                    if 'failed' in line:
-                        try:
-                            failed_count = int(line.split('failed')[0].strip().split()[-1])
-                            failures += failed_count
-                            tests_run += failed_count
-                        except (ValueError, IndexError):
-                            pass
-                    if 'error' in line:
-                        try:
-                            error_count = int(line.split('error')[0].strip().split()[-1])
-                            errors += error_count
-                        except (ValueError, IndexError):
-                            pass
-                    if 'skipped' in line:
-                        try:
-                            skip_count = int(line.split('skipped')[0].strip().split()[-1])
-                            skipped += skip_count
-                        except (ValueError, IndexError):
-                            pass
-            
-            status = 'passed' if result.returncode == 0 else 'failed'
-            
-            return {
-                'status': status,
-                'tests_run': tests_run,
-                'failures': failures,
-                'errors': errors,
-                'skipped': skipped,
-                'output': output,
-                'return_code': result.returncode,
-                'file': os.path.basename(test_file)
-            }
-            
-        except subprocess.TimeoutExpired:
-            return {
-                'status': 'timeout',
-                'tests_run': 0,
-                'failures': 0,
-                'errors': 1,
-                'skipped': 0,
-                'output': f'Test execution timed out after 30 seconds',
-                'return_code': -1,
-                'file': os.path.basename(test_file)
-            }
         except Exception as e:
             return {
                 'status': 'error',
                 'tests_run': 0,
+                'passed': 0,
                 'failures': 0,
                 'errors': 1,
                 'skipped': 0,
+                'tests': [],
+                'coverage_data': {},
                 'output': f'Error executing tests: {str(e)}',
                 'return_code': -1,
                 'file': os.path.basename(test_file)
             }
+        finally:
+            try:
+                os.unlink(records_path)
+            except OSError:
+                pass
+    
+    def execute_unittest_file(self, test_file: str) -> Dict[str, Any]:
+        # Extract just the filename (without extension) for unittest module import
+        test_module = os.path.basename(test_file).replace('.py', '')
+        timeout_args = ['--test-timeout', str(self.test_timeout)]
+        
+        test_ids = self.list_tests(test_module) if self.shard and self.max_workers > 1 else []
+        if len(test_ids) < 2:
+            return self._run_with_runner(test_file, timeout_args + [test_module])
+        
+        # Split the methods into contiguous shards (keeping a class's tests
+        # together where possible) and run one shard per worker
+        count = min(self.max_workers, len(test_ids))
+        size = -(-len(test_ids) // count)
+        shards = [test_ids[i:i + size] for i in range(0, len(test_ids), size)]
+        with ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix="shards") as pool:
+            shard_results = list(pool.map(
+                lambda shard: self._run_with_runner(test_file, timeout_args + shard, expected_ids=shard),
+                shards
+            ))
+        return merge_shard_results(shard_results)
+    
+    def execute_pytest_file(self, test_file: str) -> Dict[str, Any]:
+        if not pytest_available():
+            # Pytest not available, fall back to unittest
+            return self.execute_unittest_file(test_file)
+        
+        return self._run_with_runner(test_file, ['--pytest', os.path.abspath(test_file)])
     
     def execute_all_tests(self) -> Dict[str, Any]:
         test_files = self.find_test_files()
@@ -229,31 +532,49 @@ class TestExecutor:
                 'total_passed': 0,
                 'total_failed': 0,
                 'total_errors': 0,
+                'total_skipped': 0,
                 'test_results': []
             }
         
-        test_results = []
+        cache = get_test_result_cache() if self.use_cache else None
+        key = None
+        if cache is not None:
+            key = workspace_fingerprint(self.workspace_path, self.cache_options())
+            if not self.force:
+                cached = cache.get(key)
+                if cached is not None:
+                    logger.info(f"Test results served from cache ({key[:12]})")
+                    return dict(cached, cached=True)
+        
+        results = self._execute_test_files(test_files)
+        if cache is not None:
+            cache.put(key, results)
+        return dict(results, cached=False)
+    
+    def _execute_test_files(self, test_files: List[str]) -> Dict[str, Any]:
+        # Try unittest first (most common for generated tests). Results come
+        # back in discovery order whether or not the files run in parallel.
+        workers = min(self.max_workers, len(test_files))
+        if self.parallel and workers > 1:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tests") as pool:
+                test_results = list(pool.map(self.execute_unittest_file, test_files))
+        else:
+            test_results = [self.execute_unittest_file(test_file) for test_file in test_files]
+        
         total_tests = 0
         total_passed = 0
         total_failed = 0
         total_errors = 0
+        total_skipped = 0
         
-        for test_file in test_files:
-            # Try unittest first (most common for generated tests)
-            result = self.execute_unittest_file(test_file)
-            test_results.append(result)
-            
+        for result in test_results:
             # Aggregate counts
             total_tests += result['tests_run']
             
-            # Calculate passed tests correctly regardless of file status
-            # passed = run - failed - errors
-            passed_in_file = result['tests_run'] - result['failures'] - result['errors']
-            if passed_in_file < 0: passed_in_file = 0
-            
-            total_passed += passed_in_file
+            total_passed += result['passed']
             total_failed += result['failures']
             total_errors += result['errors']
+            total_skipped += result['skipped']
         
         # Determine overall status
         overall_status = 'passed'
@@ -262,17 +583,28 @@ class TestExecutor:
         elif total_tests == 0:
             overall_status = 'no_tests'
         
-        return {
+        results = {
             'status': overall_status,
             'message': f'Executed {len(test_files)} test file(s)',
             'total_tests': total_tests,
             'total_passed': total_passed,
             'total_failed': total_failed,
             'total_errors': total_errors,
+            'total_skipped': total_skipped,
             'test_results': test_results
         }
+        
+        if self.coverage:
+            executed = {}
+            for result in test_results:
+                merge_coverage_data(executed, result.get('coverage_data', {}))
+            results['coverage'] = summarize_coverage(self.workspace_path, executed, test_files)
+        return results
 
 
-def run_tests_in_workspace(workspace_path: str) -> Dict[str, Any]:
-    executor = TestExecutor(workspace_path)
+def run_tests_in_workspace(workspace_path: str, parallel: bool = True, max_workers: int = None,
+                           use_pool: bool = True, use_cache: bool = True, force: bool = False,
+                           test_timeout: float = 10, coverage: Optional[bool] = None) -> Dict[str, Any]:
+    executor = TestExecutor(workspace_path, parallel=parallel, max_workers=max_workers, use_pool=use_pool,
+                            use_cache=use_cache, force=force, test_timeout=test_timeout, coverage=coverage)
     return executor.execute_all_tests()
\ No newline at end of file
@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import queue
+import selectors
+import threading
+import subprocess
+from typing import Dict, Any, Optional, List
+from utils.config import get_config_provider
+from utils.logger import setup_logger
+
+logger = setup_logger()
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_worker.py')
+
+
+class TestWorkerError(RuntimeError):
+    """The worker process died or answered with garbage; the job was not run."""
+
+
+def pool_supported() -> bool:
+    return hasattr(os, 'fork') and hasattr(os, 'killpg')
+
+
+class TestWorker:
+    """One warm interpreter running utils/test_worker.py."""
+
+    def __init__(self):
+        env = os.environ.copy()
+        env['PYTHONDONTWRITEBYTECODE'] = '1'
+        self.proc = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            env=env,
+        )
+        self.uses = 0
+        self._ready = False
+
+    def _read_line(self, timeout: float) -> Dict[str, Any]:
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.proc.stdout, selectors.EVENT_READ)
+            if not selector.select(timeout):
+                raise TestWorkerError(f'Test worker {self.proc.pid} did not answer within {timeout:.0f}s')
+        line = self.proc.stdout.readline()
+        if not line:
+            raise TestWorkerError(f'Test worker {self.proc.pid} exited with code {self.proc.poll()}')
+        try:
+            return json.loads(line)
+        except ValueError:
+            raise TestWorkerError(f'Test worker {self.proc.pid} sent an invalid reply')
+
+    def run(self, cwd: str, args: List[str], timeout: float, max_output: int) -> Dict[str, Any]:
+        if not self._ready:
+            self._read_line(timeout=30)
+            self._ready = True
+        self.uses += 1
+        request = {'cwd': cwd, 'args': args, 'timeout': timeout, 'max_output': max_output}
+        try:
+            self.proc.stdin.write(json.dumps(request) + '\n')
+            self.proc.stdin.flush()
+        except OSError as e:
+            raise TestWorkerError(f'Test worker {self.proc.pid} is gone: {e}')
+        # The worker enforces the timeout itself; the margin only catches a
+        # wedged worker.
+        return self._read_line(timeout=timeout + 10)
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+
+
+class TestWorkerPool:
+    """Pre-started interpreters that have already imported unittest, pytest
+    and the result runner. Each job runs in a child forked from a worker, so
+    test files stay isolated from one another while skipping interpreter
+    startup. Workers are replaced after ``max_uses`` jobs or any failure.
+    """
+
+    def __init__(self, size: int = 2, max_uses: int = 50):
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self._idle: "queue.Queue[TestWorker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(self.size):
+            self._idle.put(TestWorker())
+
+    def run(self, cwd: str, args: List[str], timeout: float = 30, max_output: int = 256 * 1024) -> Dict[str, Any]:
+        worker = self._idle.get()
+        try:
+            result = worker.run(cwd, args, timeout, max_output)
+        except TestWorkerError:
+            self._replace(worker)
+            raise
+        if worker.uses >= self.max_uses or not worker.alive():
+            self._replace(worker)
+        else:
+            self._idle.put(worker)
+        return result
+
+    def _replace(self, worker: TestWorker):
+        if worker.alive():
+            worker.close()
+        else:
+            logger.warning(f'Test worker {worker.proc.pid} exited with code {worker.proc.returncode}; replacing it')
+        with self._lock:
+            closed = self._closed
+        if not closed:
+            self._idle.put(TestWorker())
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_default_pool: Optional[TestWorkerPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_test_worker_pool() -> Optional[TestWorkerPool]:
+    """Process-wide pool sized by TEST_WORKERS (default: available cores,
+    0 disables it) with workers recycled after TEST_WORKER_MAX_USES jobs.
+    Returns None where fork is unavailable."""
+    global _default_pool
+    if not pool_supported():
+        return None
+    with _default_pool_lock:
+        if _default_pool is None:
+            from utils.test_executor import available_cpus
+            config = get_config_provider()
+            size = int(config.get('TEST_WORKERS', str(available_cpus())))
+            if size <= 0:
+                return None
+            _default_pool = TestWorkerPool(
+                size=size,
+                max_uses=int(config.get('TEST_WORKER_MAX_USES', '50')),
+            )
+        return _default_pool
@@ -0,0 +1,386 @@
+"""Runs a workspace test module and writes one JSON record per test.
+
+This file is executed as a script inside the test subprocess, with the
+workspace as the working directory:
+
+    python test_runner.py --json-out results.jsonl test_main
+    python test_runner.py --json-out results.jsonl --test-timeout 10 test_main.T.test_a test_main.T.test_b
+    python test_runner.py --json-out ids.jsonl --list test_main
+    python test_runner.py --pytest --json-out results.jsonl test_main.py
+
+Each line of the output file is ``{"id", "outcome", "duration",
+"traceback"}`` where outcome is one of passed, failed, error, skipped,
+xfail, xpass or timeout. The usual verbose runner output still goes to the
+console. With ``--list`` only ``{"id"}`` lines are written, and none at all
+if the module fails to import, since its tests cannot be run one by one.
+
+``--limits`` takes a JSON object of resource limits (see LIMITS) applied to
+this process before any test code is imported. ``--coverage`` adds a final
+``{"coverage": {file: {"lines", "functions"}}}`` line listing the lines and
+functions of non-test workspace modules that ran.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import fnmatch
+import threading
+import selectors
+import argparse
+import unittest
+
+# Same patterns TestExecutor uses to find test files; these are left out of coverage
+TEST_FILE_PATTERNS = ("test_*.py", "*_test.py", "test_suite.py")
+
+# Keys accepted by --limits and the rlimit each one sets. memory is in
+# bytes, cpu in seconds. processes is RLIMIT_NPROC, which counts every
+# process of the user, not just this one's children.
+LIMITS = {
+    "memory": "RLIMIT_AS",
+    "cpu": "RLIMIT_CPU",
+    "open_files": "RLIMIT_NOFILE",
+    "processes": "RLIMIT_NPROC",
+}
+
+
+def apply_limits(limits):
+    try:
+        import resource
+    except ImportError:
+        return
+    for name, value in limits.items():
+        rlimit = getattr(resource, LIMITS.get(name, ""), None)
+        if not value or rlimit is None:
+            continue
+        _, hard = resource.getrlimit(rlimit)
+        value = int(value)
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+        # The CPU soft limit raises SIGXCPU; the hard limit a second later kills.
+        new_hard = value + 1 if name == "cpu" and (hard == resource.RLIM_INFINITY or hard > value) else value
+        try:
+            resource.setrlimit(rlimit, (value, new_hard))
+        except (ValueError, OSError) as e:
+            print(f"Could not set {name} limit: {e}", file=sys.stderr)
+
+
+class BoundedOutput:
+    """Keeps the first and last ``max_bytes // 2`` bytes written to it."""
+
+    def __init__(self, max_bytes: int):
+        self.head_limit = max_bytes // 2
+        self.tail_limit = max_bytes - self.head_limit
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.dropped = 0
+
+    def write(self, data: bytes):
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if not data:
+            return
+        self.tail += data
+        excess = len(self.tail) - self.tail_limit
+        if excess > 0:
+            del self.tail[:excess]
+            self.dropped += excess
+
+    def getvalue(self) -> str:
+        text = self.head.decode("utf-8", errors="replace")
+        if self.dropped:
+            text += f"\n... [{self.dropped} bytes of output omitted] ...\n"
+        return text + self.tail.decode("utf-8", errors="replace")
+
+
+def capture_output(fd: int, output: BoundedOutput, exited, deadline: float) -> bool:
+    """Read ``fd`` into ``output`` until the process has exited and the pipe
+    is drained, or ``deadline`` passes. ``exited()`` polls the process.
+    Returns False on timeout."""
+    done = False
+    with selectors.DefaultSelector() as selector:
+        selector.register(fd, selectors.EVENT_READ)
+        while True:
+            if time.monotonic() > deadline:
+                return False
+            if selector.select(0.05):
+                chunk = os.read(fd, 65536)
+                if chunk:
+                    output.write(chunk)
+                    continue
+                # EOF: the process and everything it spawned closed the pipe
+                while not done and time.monotonic() <= deadline:
+                    done = exited()
+                    if not done:
+                        time.sleep(0.005)
+                return done
+            if done:
+                # Exited and drained, but a leftover child still holds the pipe open
+                return True
+            done = exited()
+
+
+class RecordWriter:
+
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def write(self, test_id: str, outcome: str, duration: float, tb=None):
+        record = {"id": test_id, "outcome": outcome, "duration": round(duration, 6), "traceback": tb}
+        self._file.write(json.dumps(record) + "\n")
+
+    def write_coverage(self, data):
+        self._file.write(json.dumps({"coverage": data}) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+class CoverageCollector:
+    """Records which lines and functions of the workspace's non-test modules run.
+
+    On Python 3.12+ this uses sys.monitoring: every line and function start
+    is reported once and then disabled, so covered code runs at full speed
+    afterwards. Older interpreters fall back to sys.settrace, tracing only
+    frames of workspace modules.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.join(os.path.abspath(root), "")
+        self.lines = {}
+        self.functions = {}
+        self._wanted = {}
+        self._tool = None
+
+    def wanted(self, filename: str) -> bool:
+        result = self._wanted.get(filename)
+        if result is None:
+            path = os.path.abspath(filename)
+            name = os.path.basename(path)
+            result = (
+                path.startswith(self.root)
+                and name.endswith(".py")
+                and not any(fnmatch.fnmatch(name, pattern) for pattern in TEST_FILE_PATTERNS)
+            )
+            self._wanted[filename] = result
+        return result
+
+    def _add_function(self, code):
+        self.functions.setdefault(code.co_filename, set()).add((code.co_firstlineno, code.co_name))
+
+    def start(self):
+        monitoring = getattr(sys, "monitoring", None)
+        if monitoring is not None and monitoring.get_tool(monitoring.COVERAGE_ID) is None:
+            self._tool = monitoring.COVERAGE_ID
+            monitoring.use_tool_id(self._tool, "workspace-coverage")
+            monitoring.register_callback(self._tool, monitoring.events.LINE, self._on_line)
+            monitoring.register_callback(self._tool, monitoring.events.PY_START, self._on_start)
+            monitoring.set_events(self._tool, monitoring.events.LINE | monitoring.events.PY_START)
+        else:
+            sys.settrace(self._trace_call)
+            threading.settrace(self._trace_call)
+
+    def stop(self):
+        if self._tool is not None:
+            monitoring = sys.monitoring
+            monitoring.set_events(self._tool, 0)
+            monitoring.free_tool_id(self._tool)
+            self._tool = None
+        else:
+            sys.settrace(None)
+            threading.settrace(None)
+
+    def _on_line(self, code, line):
+        if self.wanted(code.co_filename):
+            self.lines.setdefault(code.co_filename, set()).add(line)
+        return sys.monitoring.DISABLE
+
+    def _on_start(self, code, offset):
+        if self.wanted(code.co_filename):
+            self._add_function(code)
+        return sys.monitoring.DISABLE
+
+    def _trace_call(self, frame, event, arg):
+        code = frame.f_code
+        if not self.wanted(code.co_filename):
+            return None
+        self._add_function(code)
+        lines = self.lines.setdefault(code.co_filename, set())
+
+        def trace_line(frame, event, arg):
+            if event == "line":
+                lines.add(frame.f_lineno)
+            return trace_line
+
+        return trace_line
+
+    def data(self):
+        result = {}
+        for filename in set(self.lines) | set(self.functions):
+            name = os.path.relpath(os.path.abspath(filename), self.root).replace(os.sep, "/")
+            result[name] = {
+                "lines": sorted(self.lines.get(filename, ())),
+                "functions": sorted(self.functions.get(filename, ())),
+            }
+        return result
+
+
+class TestTimeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise TestTimeout("Test timed out")
+
+
+def make_result_class(writer: RecordWriter, test_timeout: float = 0):
+    use_alarm = bool(test_timeout) and hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+
+    class JsonTestResult(unittest.TextTestResult):
+
+        def startTest(self, test):
+            self._started = time.perf_counter()
+            super().startTest(test)
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, test_timeout)
+
+        def stopTest(self, test):
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+            super().stopTest(test)
+
+        def _record(self, test, outcome, err=None):
+            started = getattr(self, "_started", None)
+            duration = time.perf_counter() - started if started is not None else 0.0
+            tb = self._exc_info_to_string(err, test) if err else None
+            writer.write(test.id(), outcome, duration, tb)
+
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            self._record(test, "passed")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            self._record(test, "failed", err)
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            timed_out = err[0] is TestTimeout
+            self._record(test, "timeout" if timed_out else "error", err)
+
+        def addSkip(self, test, reason):
+            super().addSkip(test, reason)
+            self._record(test, "skipped")
+
+        def addExpectedFailure(self, test, err):
+            super().addExpectedFailure(test, err)
+            self._record(test, "xfail")
+
+        def addUnexpectedSuccess(self, test):
+            super().addUnexpectedSuccess(test)
+            self._record(test, "xpass")
+
+        def addSubTest(self, test, subtest, err):
+            super().addSubTest(test, subtest, err)
+            if err is not None:
+                failed = issubclass(err[0], test.failureException)
+                self._record(subtest, "failed" if failed else "error", err)
+
+    return JsonTestResult
+
+
+def iter_tests(suite):
+    for item in suite:
+        if isinstance(item, unittest.TestSuite):
+            yield from iter_tests(item)
+        else:
+            yield item
+
+
+def list_unittest(module: str, path: str):
+    loader = unittest.TestLoader()
+    tests = list(iter_tests(loader.loadTestsFromName(module)))
+    if loader.errors or any(type(t).__module__ == "unittest.loader" for t in tests):
+        return
+    with open(path, "a", encoding="utf-8") as f:
+        for test in tests:
+            f.write(json.dumps({"id": test.id()}) + "\n")
+
+
+def run_unittest(names, writer: RecordWriter, test_timeout: float = 0) -> int:
+    suite = unittest.defaultTestLoader.loadTestsFromNames(names)
+    runner = unittest.TextTestRunner(verbosity=2, resultclass=make_result_class(writer, test_timeout))
+    result = runner.run(suite)
+    return 0 if result.wasSuccessful() else 1
+
+
+class PytestJsonPlugin:
+
+    def __init__(self, writer: RecordWriter):
+        self.writer = writer
+
+    def pytest_runtest_logreport(self, report):
+        tb = str(report.longrepr) if report.longrepr else None
+        if report.when == "call":
+            if hasattr(report, "wasxfail"):
+                outcome = "xfail" if report.skipped else "xpass"
+            else:
+                outcome = report.outcome
+            self.writer.write(report.nodeid, outcome, report.duration, tb)
+        elif report.failed:
+            self.writer.write(report.nodeid, "error", report.duration, tb)
+        elif report.skipped and report.when == "setup":
+            self.writer.write(report.nodeid, "skipped", report.duration, None)
+
+    def pytest_collectreport(self, report):
+        if report.failed:
+            self.writer.write(report.nodeid, "error", 0.0, str(report.longrepr))
+
+
+def run_pytest(path: str, writer: RecordWriter) -> int:
+    import pytest
+    return int(pytest.main([path, "-v", "--tb=short", "-p", "no:cacheprovider"], plugins=[PytestJsonPlugin(writer)]))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("targets", nargs="+", help="test module or test ids (unittest), or a file path (pytest)")
+    parser.add_argument("--json-out", required=True)
+    parser.add_argument("--pytest", action="store_true")
+    parser.add_argument("--list", action="store_true", help="write the module's test ids instead of running them")
+    parser.add_argument("--test-timeout", type=float, default=0, help="seconds allowed per unittest test")
+    parser.add_argument("--limits", type=json.loads, default={}, help="JSON object of resource limits")
+    parser.add_argument("--coverage", action="store_true", help="record coverage of workspace modules")
+    args = parser.parse_args(argv)
+
+    apply_limits(args.limits)
+
+    # Make the workspace importable the way "python -m unittest" does, and
+    # keep this directory's modules out of the generated tests' way.
+    sys.path[0] = os.getcwd()
+
+    if args.list:
+        list_unittest(args.targets[0], args.json_out)
+        return 0
+
+    writer = RecordWriter(args.json_out)
+    collector = CoverageCollector(os.getcwd()) if args.coverage else None
+    if collector is not None:
+        collector.start()
+    try:
+        if args.pytest:
+            return run_pytest(args.targets[0], writer)
+        return run_unittest(args.targets, writer, args.test_timeout)
+    finally:
+        if collector is not None:
+            collector.stop()
+            writer.write_coverage(collector.data())
+        writer.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
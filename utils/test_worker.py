@@ -0,0 +1,106 @@
+"""Warm test worker used by utils/test_pool.py.
+
+The worker imports the test tooling once, then reads one JSON request per
+line from stdin:
+
+    {"cwd": "/path/to/workspace", "args": [...], "timeout": 30, "max_output": 262144}
+
+For each request it forks a child that changes into ``cwd`` and runs
+``test_runner.main(args)``, so tests never see each other's modules or
+state. The reply is one JSON line with ``return_code``, ``output`` (at most
+``max_output`` bytes, head and tail) and ``timed_out``.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import unittest  # noqa: F401 - preloaded so forked children don't import it per run
+
+import test_runner
+
+try:
+    import pytest  # noqa: F401 - preloaded so forked children don't import it per run
+except ImportError:
+    pass
+
+
+def run_child(request, output_fd):
+    os.setpgid(0, 0)
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(output_fd, 1)
+    os.dup2(output_fd, 2)
+    sys.stdout = os.fdopen(1, "w", buffering=1)
+    sys.stderr = os.fdopen(2, "w", buffering=1)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    import random
+    random.seed()
+
+    code = 1
+    try:
+        os.chdir(request["cwd"])
+        code = test_runner.main(request["args"])
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else 1
+    except BaseException:
+        import traceback
+        traceback.print_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def handle(request):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        run_child(request, write_fd)
+    os.close(write_fd)
+
+    status = []
+
+    def exited():
+        done, code = os.waitpid(pid, os.WNOHANG)
+        if done:
+            status.append(code)
+        return bool(done)
+
+    output = test_runner.BoundedOutput(request.get("max_output", 256 * 1024))
+    deadline = time.monotonic() + request.get("timeout", 30)
+    try:
+        finished = test_runner.capture_output(read_fd, output, exited, deadline)
+    finally:
+        os.close(read_fd)
+    # Take down anything the tests left running, and the child on timeout
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    if not status:
+        status.append(os.waitpid(pid, 0)[1])
+    return {
+        "return_code": os.waitstatus_to_exitcode(status[0]),
+        "output": output.getvalue(),
+        "timed_out": not finished,
+    }
+
+
+def main():
+    # Replies go over a private copy of stdout; anything else that prints in
+    # this process ends up on stderr instead of corrupting the channel.
+    channel = os.fdopen(os.dup(1), "w", buffering=1)
+    os.dup2(2, 1)
+    channel.write(json.dumps({"ready": True}) + "\n")
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        reply = handle(json.loads(line))
+        channel.write(json.dumps(reply) + "\n")
+
+
+if __name__ == "__main__":
+    main()
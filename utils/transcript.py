@@ -0,0 +1,173 @@
+import sys
+import tempfile
+import threading
+from collections.abc import Mapping, Sequence
+from typing import Dict, Any, Optional, List, Iterable
+
+
+class TranscriptRecord(Mapping):
+    """One transcript message.
+
+    Behaves like a read-only ``{"role", "name", "content"}`` dict. Content of
+    superseded records may live in the log's spill file instead of memory.
+    """
+
+    __slots__ = ("role", "name", "artifacts", "length", "_content", "_offset", "_nbytes", "_log")
+
+    _KEYS = ("role", "name", "content")
+
+    def __init__(self, log: "TranscriptLog", role: str, name: str, content: str, artifacts: tuple):
+        self._log = log
+        self.role = role
+        self.name = name
+        self.artifacts = artifacts
+        self.length = len(content)
+        self._content: Optional[str] = content
+        self._offset = -1
+        self._nbytes = 0
+
+    @property
+    def content(self) -> str:
+        if self._content is not None:
+            return self._content
+        return self._log._read_spilled(self._offset, self._nbytes)
+
+    @property
+    def spilled(self) -> bool:
+        return self._content is None
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "role":
+            return self.role
+        if key == "name":
+            return self.name
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._KEYS)
+
+    def __len__(self) -> int:
+        return len(self._KEYS)
+
+    def __repr__(self) -> str:
+        return f"TranscriptRecord(name={self.name!r}, role={self.role!r}, length={self.length})"
+
+
+class TranscriptView(Sequence):
+    """Read-only window over a prefix of a TranscriptLog; nothing is copied."""
+
+    __slots__ = ("_records", "_length")
+
+    def __init__(self, records: List[TranscriptRecord], length: int):
+        self._records = records
+        self._length = length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._records[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("transcript index out of range")
+        return self._records[index]
+
+    def __len__(self) -> int:
+        return self._length
+
+
+class TranscriptLog:
+    """Append-only message log shared by all stages of a workflow run.
+
+    Records are never copied or rewritten. The log keeps an index of the
+    latest record for every artifact (file name, review verdict, ...), and
+    once ``max_resident_chars`` is exceeded the content of superseded records
+    is moved to a temporary spill file and read back on demand.
+    """
+
+    def __init__(self, max_resident_chars: Optional[int] = None):
+        self.max_resident_chars = max_resident_chars
+        self._records: List[TranscriptRecord] = []
+        self._latest: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._spill_file = None
+        self.total_chars = 0
+        self.resident_chars = 0
+        self.spilled_records = 0
+
+    def append(self, name: str, content: str, role: str = "assistant", artifacts: Iterable[str] = ()) -> int:
+        artifacts = tuple(sys.intern(a) for a in artifacts)
+        record = TranscriptRecord(self, sys.intern(role), sys.intern(name), content, artifacts)
+        with self._lock:
+            self._records.append(record)
+            index = len(self._records) - 1
+            for artifact in artifacts:
+                self._latest[artifact] = index
+            self.total_chars += record.length
+            self.resident_chars += record.length
+            if self.max_resident_chars is not None and self.resident_chars > self.max_resident_chars:
+                self._spill()
+        return index
+
+    def latest(self, artifact: str) -> Optional[int]:
+        return self._latest.get(artifact)
+
+    def view(self) -> TranscriptView:
+        return TranscriptView(self._records, len(self._records))
+
+    def as_chat(self, indices: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        """Build the message list handed to an agent.
+
+        Agents may mutate the dicts they are given, so each call returns
+        fresh dicts, but the content strings themselves are shared.
+        """
+        if indices is None:
+            indices = range(len(self._records))
+        return [
+            {"role": self._records[i].role, "content": self._records[i].content}
+            for i in indices
+        ]
+
+    def to_messages(self) -> List[Dict[str, Any]]:
+        return [dict(record) for record in self._records]
+
+    def close(self):
+        with self._lock:
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __getitem__(self, index: int) -> TranscriptRecord:
+        return self._records[index]
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def _spill(self):
+        # Called with the lock held. Only records that are no longer the
+        # latest version of any artifact are spilled, oldest first.
+        live = set(self._latest.values())
+        for index, record in enumerate(self._records):
+            if self.resident_chars <= self.max_resident_chars:
+                break
+            if index in live or record.spilled:
+                continue
+            if self._spill_file is None:
+                self._spill_file = tempfile.TemporaryFile(prefix="transcript-", suffix=".spill")
+            data = record._content.encode("utf-8")
+            self._spill_file.seek(0, 2)
+            record._offset = self._spill_file.tell()
+            record._nbytes = len(data)
+            self._spill_file.write(data)
+            record._content = None
+            self.resident_chars -= record.length
+            self.spilled_records += 1
+
+    def _read_spilled(self, offset: int, nbytes: int) -> str:
+        with self._lock:
+            self._spill_file.seek(offset)
+            return self._spill_file.read(nbytes).decode("utf-8")
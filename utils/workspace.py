@@ -0,0 +1,199 @@
+import os
+import time
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+from utils.config import get_config_provider
+from utils.logger import setup_logger
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (Windows): only runs of this process are protected from GC
+    fcntl = None
+
+logger = setup_logger()
+
+LOCK_DIR = ".locks"
+
+_active_runs: Dict[str, int] = {}
+_active_lock = threading.Lock()
+
+
+def workspace_root() -> str:
+    return os.path.abspath(get_config_provider().get("WORKSPACE_ROOT", "workspace"))
+
+
+def workspace_for(run_id: str, root: Optional[str] = None) -> str:
+    """Directory holding the generated files of ``run_id``."""
+    if not run_id or os.sep in run_id or (os.altsep and os.altsep in run_id) or run_id.startswith("."):
+        raise ValueError(f"Invalid run id: {run_id!r}")
+    return os.path.join(root or workspace_root(), run_id)
+
+
+def _lock_path(root: str, run_id: str) -> str:
+    # Outside the run's directory, so it never ends up among the artifacts
+    return os.path.join(root, LOCK_DIR, f"{run_id}.lock")
+
+
+def _hold_run_lock(root: str, run_id: str):
+    """Shared flock on the run's lock file, held open while the run is active."""
+    if fcntl is None:
+        return None
+    path = _lock_path(root, run_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    while True:
+        lock = open(path, "a")
+        fcntl.flock(lock, fcntl.LOCK_SH)
+        try:
+            if os.path.samestat(os.fstat(lock.fileno()), os.stat(path)):
+                return lock
+        except FileNotFoundError:
+            pass
+        # Garbage collection removed this lock file while we waited for it
+        lock.close()
+
+
+@contextmanager
+def _collect_lock(root: str, run_id: str):
+    """Yields False if some process holds ``run_id`` active, else True with
+    an exclusive lock that keeps runs from starting until it is released."""
+    if fcntl is None:
+        yield True
+        return
+    path = _lock_path(root, run_id)
+    if not os.path.exists(path):
+        yield True
+        return
+    with open(path, "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+def _held_elsewhere(root: str) -> List[str]:
+    """Runs whose lock file another process (or another open here) holds."""
+    if fcntl is None:
+        return []
+    held = []
+    try:
+        names = os.listdir(os.path.join(root, LOCK_DIR))
+    except OSError:
+        return held
+    for name in names:
+        run_id, ext = os.path.splitext(name)
+        if ext != ".lock":
+            continue
+        try:
+            with open(os.path.join(root, LOCK_DIR, name), "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            held.append(run_id)
+        except OSError:
+            continue
+    return held
+
+
+@contextmanager
+def active_workspace(run_id: str):
+    """Mark ``run_id`` as in use so garbage collection leaves its workspace
+    alone, in this process and (through a shared flock on a lock file under
+    WORKSPACE_ROOT) in any other process sharing the root."""
+    path = workspace_for(run_id)
+    lock = _hold_run_lock(os.path.dirname(path), run_id)
+    with _active_lock:
+        _active_runs[run_id] = _active_runs.get(run_id, 0) + 1
+    try:
+        yield path
+    finally:
+        with _active_lock:
+            _active_runs[run_id] -= 1
+            if not _active_runs[run_id]:
+                del _active_runs[run_id]
+        if lock is not None:
+            lock.close()
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def collect_workspaces(root: str, max_bytes: int, max_age: float, keep: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Delete run workspaces older than ``max_age`` seconds, then the least
+    recently modified ones until the rest fit in ``max_bytes``. Active runs,
+    including those of other processes, and ``keep`` are never deleted.
+    Only run directories directly under ``root`` are considered."""
+    if not os.path.isdir(root):
+        return {"removed": [], "bytes": 0}
+    with _active_lock:
+        protected = set(_active_runs) | set(keep or ())
+    now = time.time()
+    runs = []
+    for entry in os.scandir(root):
+        if not entry.is_dir(follow_symlinks=False) or entry.name.startswith("."):
+            continue
+        try:
+            modified = entry.stat(follow_symlinks=False).st_mtime
+        except OSError:
+            continue
+        runs.append([modified, entry.name, _dir_size(entry.path)])
+    runs.sort()
+
+    total = sum(size for _, _, size in runs)
+    removed = []
+    for modified, name, size in runs:
+        if name in protected:
+            continue
+        if now - modified <= max_age and total <= max_bytes:
+            continue
+        with _collect_lock(root, name) as idle:
+            if not idle:
+                continue
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        removed.append(name)
+        total -= size
+    if removed:
+        logger.info(f"Removed {len(removed)} old run workspace(s); {total} bytes left in {root}")
+    return {"removed": removed, "bytes": total}
+
+
+def gc_workspaces(keep: Optional[List[str]] = None) -> Dict[str, Any]:
+    """collect_workspaces() under WORKSPACE_ROOT with the WORKSPACE_QUOTA_MB
+    and WORKSPACE_MAX_AGE_HOURS limits. Checkpoints past the same age, and
+    completed ones whose workspace was removed, are deleted too."""
+    from utils.checkpoint import get_checkpoint_store
+
+    config = get_config_provider()
+    max_age = float(config.get("WORKSPACE_MAX_AGE_HOURS", "24")) * 3600
+    result = collect_workspaces(
+        workspace_root(),
+        max_bytes=int(float(config.get("WORKSPACE_QUOTA_MB", "1024")) * 1024 * 1024),
+        max_age=max_age,
+        keep=keep,
+    )
+    with _active_lock:
+        protected = set(_active_runs) | set(keep or ())
+    protected.update(_held_elsewhere(workspace_root()))
+    result["checkpoints_removed"] = get_checkpoint_store().collect(
+        max_age, keep=protected, remove=result["removed"],
+    )
+    if result["checkpoints_removed"]:
+        logger.info(f"Removed {len(result['checkpoints_removed'])} old checkpoint(s)")
+    return result
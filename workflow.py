@@ -1,83 +1,541 @@
 import re
 import os
-from typing import Dict, Any, Optional, List
-from autogen import GroupChat, GroupChatManager, Agent
+import time
+import queue
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, Optional, List, Tuple
 from utils.logger import setup_logger, log_agent_action, log_error_with_context
+from utils.transcript import TranscriptLog
+from utils.llm_cache import ResponseCache, get_response_cache
+from utils.checkpoint import CheckpointStore, get_checkpoint_store, new_run_id
+from utils.key_pool import KeyPool, get_key_pool, tier_of
+from utils.static_check import check_python_source
+from utils.convergence import STATIC_REVIEW_HEADER, ReviewConvergence
+from utils.patching import PATCH_INSTRUCTIONS, PatchConflict, apply_search_replace, parse_patches
+from utils.workspace import active_workspace, gc_workspaces, workspace_for
 
 logger = setup_logger()
 
+PIPELINE = [
+    "Controller_agent",
+    "Requirements_Agent",
+    "coding_agent",
+    "review_agent",
+    "Documentation_Agent",
+    "QA_Agent",
+    "Deployment_agent",
+    "UI_agent",
+]
+
+# Stages that only depend on the approved code and requirements, so they can
+# run side by side once review_agent is done with the code.
+FANOUT_STAGES = [
+    "Documentation_Agent",
+    "QA_Agent",
+    "Deployment_agent",
+    "UI_agent",
+]
+
+# Artifacts each stage is shown instead of the whole transcript. "request" is
+# the system context carrying the user's request, "controller" the latest
+# Controller_agent instruction and "review" the latest review verdict; any
+# other entry is the latest message that produced that file.
+STAGE_CONTEXT = {
+    "Controller_agent": ["request"],
+    "Requirements_Agent": ["request", "controller"],
+    "coding_agent": ["request", "requirements.md", "main.py", "review"],
+    "review_agent": ["request", "requirements.md", "main.py"],
+    "Documentation_Agent": ["request", "requirements.md", "main.py"],
+    "QA_Agent": ["request", "requirements.md", "main.py"],
+    "Deployment_agent": ["request", "requirements.md", "main.py"],
+    "UI_agent": ["request", "requirements.md", "main.py"],
+}
+
+# Files each stage is expected to produce. Once all of them are closed in a
+# streamed reply the request is cut off, since anything after the last
+# ===END_FILE=== is commentary nobody reads.
+STAGE_OUTPUTS = {
+    "Requirements_Agent": ["requirements.md"],
+    "coding_agent": ["main.py"],
+    "Documentation_Agent": ["README.md"],
+    "QA_Agent": ["test_main.py"],
+    "Deployment_agent": ["Dockerfile", "run.sh"],
+    "UI_agent": ["app_ui.py"],
+}
+
+ROLE_ARTIFACTS = {
+    "System": "request",
+    "Controller_agent": "controller",
+    "review_agent": "review",
+}
+
+BEGIN_FILE_MARKER = "===BEGIN_FILE"
+END_FILE_MARKER = "===END_FILE==="
+FILE_HEADER_PATTERN = re.compile(r"\s*:\s*([^\n=]+)===")
+MAX_FILE_HEADER_CHARS = 512
+
+
+class FileMarkerParser:
+    """Incremental parser for ===BEGIN_FILE:name=== ... ===END_FILE=== blocks.
+
+    Text can be fed in arbitrary chunks; every character is scanned a constant
+    number of times, so malformed or unterminated markers cannot make parsing
+    super-linear. One parser handles one reply.
+    """
+
+    def __init__(self):
+        self.current: Optional[str] = None
+        self._parts: List[str] = []
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Consume ``chunk`` and return the files completed by it."""
+        buf = self._buffer + chunk if self._buffer else chunk
+        pos = 0
+        completed = []
+        while True:
+            if self.current is None:
+                start = buf.find(BEGIN_FILE_MARKER, pos)
+                if start < 0:
+                    # Hold back a tail that may be the start of a marker.
+                    pos = max(pos, len(buf) - len(BEGIN_FILE_MARKER) + 1)
+                    break
+                header_start = start + len(BEGIN_FILE_MARKER)
+                match = FILE_HEADER_PATTERN.match(buf, header_start)
+                if match is None:
+                    eq = buf.find("=", header_start)
+                    incomplete = eq < 0 or len(buf) - eq < 3
+                    if incomplete and len(buf) - header_start < MAX_FILE_HEADER_CHARS:
+                        pos = start
+                        break
+                    pos = header_start
+                    continue
+                self.current = match.group(1).strip()
+                pos = match.end()
+            else:
+                end = buf.find(END_FILE_MARKER, pos)
+                if end < 0:
+                    keep = max(pos, len(buf) - len(END_FILE_MARKER) + 1)
+                    self._parts.append(buf[pos:keep])
+                    pos = keep
+                    break
+                self._parts.append(buf[pos:end])
+                completed.append((self.current, "".join(self._parts).strip()))
+                self.current = None
+                self._parts = []
+                pos = end + len(END_FILE_MARKER)
+        self._buffer = buf[pos:]
+        return completed
+
+    def partial(self) -> Optional[Tuple[str, str]]:
+        """The file currently being read and its content so far, if any."""
+        if self.current is None:
+            return None
+        return self.current, "".join(self._parts)
+
+    def close(self) -> Optional[str]:
+        """End the reply, dropping an unterminated file. Returns its name."""
+        dropped = self.current
+        self.current = None
+        self._parts = []
+        self._buffer = ""
+        return dropped
+
+
+def parse_files(text: str) -> List[Tuple[str, str]]:
+    parser = FileMarkerParser()
+    files = parser.feed(text)
+    dropped = parser.close()
+    if dropped:
+        logger.warning(f"Ignoring unterminated file block: {dropped}")
+    return files
+
+
+def write_workspace_files(files: Dict[str, str], workspace_path: str) -> Tuple[int, int]:
+    """Write the latest version of each file, skipping files whose content on
+    disk is already identical. Each write goes through a temp file and
+    os.replace so readers never see a half-written file.
+
+    Returns (written, unchanged).
+    """
+    workspace_path = os.path.abspath(workspace_path)
+    written = unchanged = 0
+    for filename, content in files.items():
+        filepath = os.path.abspath(os.path.join(workspace_path, filename))
+        if os.path.commonpath([filepath, workspace_path]) != workspace_path:
+            logger.warning(f"Refusing to write {filename}: path escapes the workspace")
+            continue
+
+        data = content.encode("utf-8")
+        if os.path.isfile(filepath) and os.path.getsize(filepath) == len(data):
+            with open(filepath, "rb") as f:
+                if hashlib.sha256(f.read()).digest() == hashlib.sha256(data).digest():
+                    unchanged += 1
+                    continue
+
+        directory = os.path.dirname(filepath)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, filepath)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        written += 1
+    return written, unchanged
+
+
+class StopGeneration(Exception):
+    """Raised inside the streaming loop to end a request early."""
+
+
+ANSI_ESCAPE_PATTERN = re.compile(r"\x1b\[[0-9;]*m")
+
+
+class StageStream:
+    """autogen IOStream that receives a stage's reply token by token.
+
+    Tokens are fed to a FileMarkerParser; partial file content is passed to
+    ``emit`` (at most every ``interval`` seconds, and whenever a file
+    closes), and StopGeneration is raised once every expected file is done.
+    """
+
+    def __init__(self, role: str, expected_files: List[str], emit=None, interval: float = 0.25):
+        self.role = role
+        self.expected = set(expected_files)
+        self.emit = emit
+        self.interval = interval
+        self.reset()
+
+    def reset(self):
+        self.parser = FileMarkerParser()
+        self.closed = set()
+        self.parts: List[str] = []
+        self._last_emit = 0.0
+
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    def print(self, *objects: Any, sep: str = " ", end: str = "\n", flush: bool = False):
+        # autogen also prints terminal colour codes around the streamed text.
+        chunk = ANSI_ESCAPE_PATTERN.sub("", sep.join(map(str, objects)) + end)
+        if not chunk:
+            return
+        self.parts.append(chunk)
+        completed = self.parser.feed(chunk)
+        for filename, content in completed:
+            self.closed.add(filename)
+            if self.emit:
+                self.emit((self.role, filename, content))
+        if self.emit and not completed and time.monotonic() - self._last_emit >= self.interval:
+            partial = self.parser.partial()
+            if partial:
+                self._last_emit = time.monotonic()
+                self.emit((self.role, partial[0], partial[1]))
+        if self.expected and self.expected <= self.closed:
+            raise StopGeneration()
+
+    def input(self, prompt: str = "", *, password: bool = False) -> str:
+        return ""
+
+
+def static_review(files: Dict[str, str]) -> Optional[str]:
+    """A FIX_REQUIRED verdict for main.py problems that need no model to
+    spot (see check_python_source), or None if it passes."""
+    source = files.get("main.py")
+    if source is None:
+        issues = ["No main.py was produced; wrap the code in ===BEGIN_FILE: main.py=== ... ===END_FILE==="]
+    else:
+        local_modules = [name[:-3] for name in files if name.endswith(".py")]
+        issues = check_python_source(source, "main.py", local_modules)
+    if not issues:
+        return None
+    lines = ["FIX_REQUIRED", STATIC_REVIEW_HEADER]
+    lines.extend(f"{n}. {issue}" for n, issue in enumerate(issues, start=1))
+    return "\n".join(lines)
+
+
+def message_artifacts(name: str, filenames: List[str]) -> List[str]:
+    artifacts = list(filenames)
+    if name in ROLE_ARTIFACTS:
+        artifacts.append(ROLE_ARTIFACTS[name])
+    return artifacts
+
+
+def select_context(role: str, transcript: TranscriptLog) -> List[Dict[str, Any]]:
+    """Build the chat history for ``role`` from the latest artifacts it needs.
+
+    Roles without an entry in STAGE_CONTEXT get the whole transcript.
+    """
+    wanted = STAGE_CONTEXT.get(role)
+    if wanted is None:
+        return transcript.as_chat()
+    indices = {transcript.latest(a) for a in wanted}
+    indices.discard(None)
+    return transcript.as_chat(sorted(indices))
+
 
 class WorkflowOrchestrator:
     
-    def __init__(self, agents: Dict[str, Any], max_review_iterations: int = 5, progress_callback=None):
+    def __init__(self, agents: Dict[str, Any], max_review_iterations: int = 5, progress_callback=None,
+                 parallel_fanout: bool = True, max_resident_chars: Optional[int] = 256_000,
+                 stream: bool = True, stream_callback=None,
+                 response_cache: Optional[ResponseCache] = None, run_id: Optional[str] = None,
+                 checkpoint_store: Optional[CheckpointStore] = None, key_pool: Optional[KeyPool] = None,
+                 static_gate: bool = True, patch_revisions: bool = True):
         self.agents = agents
         self.max_review_iterations = max_review_iterations
         self.review_iteration_count = 0
+        self.convergence = ReviewConvergence()
         self.progress_callback = progress_callback
+        self.parallel_fanout = parallel_fanout
+        self.stream = stream
+        self.stream_callback = stream_callback
+        self.max_resident_chars = max_resident_chars
+        self.response_cache = response_cache if response_cache is not None else get_response_cache()
+        self.run_id = run_id or new_run_id()
+        self.checkpoint_store = checkpoint_store if checkpoint_store is not None else get_checkpoint_store()
+        self.key_pool = key_pool if key_pool is not None else get_key_pool()
+        # Check main.py locally before paying for a review_agent call
+        self.static_gate = static_gate
+        # Ask coding_agent for search/replace edits instead of a full rewrite on revisions
+        self.patch_revisions = patch_revisions
+        self.user_request = ""
+        self.pipeline: List[str] = list(PIPELINE)
+        self.position = 0
+        self.transcript = TranscriptLog(max_resident_chars)
+        self.files: Dict[str, str] = {}
+        self.file_sources: Dict[str, str] = {}
         
         logger.info("WorkflowOrchestrator initialized")
         log_agent_action(
             logger,
             "System",
             "Configuration",
-            f"Max review iterations: {max_review_iterations}"
+            f"Max review iterations: {max_review_iterations}, parallel fan-out: {parallel_fanout}, "
+            f"LLM cache: {self.response_cache.mode}, run id: {self.run_id}"
         )
         
 
-    def create_group_chat(self) -> GroupChat:
-        agents_list = [
-            self.agents["Controller_agent"],
-            self.agents["Requirements_Agent"],
-            self.agents["coding_agent"],
-            self.agents["review_agent"],
-            self.agents["Documentation_Agent"],
-            self.agents["QA_Agent"],
-            self.agents["Deployment_agent"],
-            self.agents["UI_agent"],
-        ]
-        
-        groupchat = GroupChat(
-            agents=agents_list,
-            messages=[],
-            max_round=50,
+    def _record_message(self, name: str, content: str, role: str = "assistant") -> int:
+        filenames = []
+        if role == "assistant":
+            for filename, file_content in parse_files(content):
+                self.files[filename] = file_content
+                self.file_sources[filename] = name
+                filenames.append(filename)
+                logger.info(f"[{name}] Extracted file: {filename} ({len(file_content)} chars)")
+        return self.transcript.append(name, content, role=role, artifacts=message_artifacts(name, filenames))
+
+    def _build_context(self, role: str) -> List[Dict[str, Any]]:
+        chat_history = select_context(role, self.transcript)
+        if role == "coding_agent" and self._wants_patch():
+            chat_history.append({"role": "user", "content": PATCH_INSTRUCTIONS})
+        context_chars = sum(len(m["content"]) for m in chat_history)
+        logger.info(
+            f"Context for {role}: {len(chat_history)} messages / {context_chars} chars "
+            f"(full transcript: {len(self.transcript)} messages / {self.transcript.total_chars} chars)"
         )
-        
-        logger.info(f"GroupChat created with {len(agents_list)} agents")
-        return groupchat
-    
-    def create_manager(self, groupchat: GroupChat, llm_config: Dict[str, Any]) -> GroupChatManager:
-        return GroupChatManager(groupchat=groupchat, llm_config=llm_config)
+        return chat_history
+
+    def _wants_patch(self) -> bool:
+        return self.patch_revisions and self.review_iteration_count > 0 and "main.py" in self.files
+
+    def _apply_patches(self, reply: str) -> str:
+        """Replace the search/replace blocks of ``reply`` with the full
+        patched files, keeping any complete files it also contains. Raises
+        PatchConflict if an edit does not apply or the reply has no edits."""
+        patches = parse_patches(reply)
+        files = parse_files(reply)
+        if not patches:
+            if not files:
+                raise PatchConflict("the reply contains neither SEARCH/REPLACE edits nor complete files")
+            return reply
+        both = sorted({filename for filename, _ in files} & set(patches))
+        if both:
+            raise PatchConflict(f"{both[0]} is both patched and rewritten in the same reply")
+        blocks = [f"{BEGIN_FILE_MARKER}:{filename}===\n{content}\n{END_FILE_MARKER}" for filename, content in files]
+        edits = 0
+        for filename, hunks in patches.items():
+            if filename not in self.files:
+                raise PatchConflict(f"{filename} does not exist yet, so it cannot be patched")
+            patched = apply_search_replace(self.files[filename], hunks)
+            edits += len(hunks)
+            blocks.append(f"{BEGIN_FILE_MARKER}:{filename}===\n{patched}\n{END_FILE_MARKER}")
+            logger.info(
+                f"Patched {filename} with {len(hunks)} edit(s): {len(reply)} chars of reply "
+                f"instead of {len(patched)} for a rewrite"
+            )
+        return f"Applied {edits} search/replace edit(s).\n" + "\n".join(blocks)
+
+    def _revise_code(self, role: str, chat_history: List[Dict[str, Any]], reply: str) -> str:
+        try:
+            return self._apply_patches(reply)
+        except PatchConflict as e:
+            conflict = str(e)
+        logger.warning(f"{role} patch did not apply ({conflict}); asking for a full rewrite")
+        fallback = [m for m in chat_history if m["content"] is not PATCH_INSTRUCTIONS]
+        fallback.append({
+            "role": "user",
+            "content": f"Your edits could not be applied: {conflict}\n"
+                       f"Return the complete, corrected main.py in the ===BEGIN_FILE:main.py=== format.",
+        })
+        return self._run_stage(role, fallback)
+
+    def _cache_key(self, agent, chat_history: List[Dict[str, Any]], config: Optional[Dict[str, Any]]) -> str:
+        """Cache key of a reply from the (base_url, model) tier of ``config``,
+        so replies of a fallback model are never replayed as the primary's."""
+        llm_config = getattr(agent, "llm_config", None) or {}
+        base_url, model = tier_of(config or {})
+        return ResponseCache.make_key(
+            agent.name,
+            agent.system_message,
+            f"{base_url or ''}|{model or ''}",
+            llm_config.get("temperature"),
+            chat_history,
+        )
+
+    def _generate(self, agent, chat_history: List[Dict[str, Any]], stream: Optional[StageStream] = None):
+        """The reply and the config_list entry that produced it."""
+        llm_config = getattr(agent, "llm_config", None)
+        if not llm_config or not llm_config.get("config_list"):
+            return agent.generate_reply(chat_history), None
+
+        # Rough token estimate (4 chars per token) for the prompt plus a reply.
+        prompt_chars = len(agent.system_message) + sum(len(m["content"]) for m in chat_history)
+        estimated_tokens = prompt_chars // 4 + 1024
+        config_list = llm_config["config_list"]
+        last_error = None
+        for _ in range(len(config_list) + 1):
+            key = self.key_pool.acquire(config_list, estimated_tokens)
+            try:
+                if stream is not None:
+                    client = self.key_pool.client_for(key, llm_config, stream=True)
+                    reply = self._generate_streaming(agent, chat_history, client, stream)
+                else:
+                    client = self.key_pool.client_for(key, llm_config)
+                    _, reply = agent.generate_oai_reply(messages=chat_history, config=client)
+            except Exception as e:
+                if not self.key_pool.report_failure(key, e):
+                    raise
+                last_error = e
+                continue
+            reply_chars = len(reply.get("content") or "") if isinstance(reply, dict) else len(reply or "")
+            self.key_pool.report_success(key, (prompt_chars + reply_chars) // 4, estimated_tokens)
+            return reply, key.config
+        raise last_error
+
+    def _generate_streaming(self, agent, chat_history: List[Dict[str, Any]], client, stream: StageStream):
+        from autogen.io import IOStream
+
+        stream.reset()
+        try:
+            with IOStream.set_default(stream):
+                _, reply = agent.generate_oai_reply(messages=chat_history, config=client)
+        except StopGeneration:
+            reply = stream.text()
+            logger.info(f"{agent.name}: all expected files received, stopped generation early")
+        return reply
+
+    def _emit_stream_event(self, event):
+        if self.stream_callback:
+            self.stream_callback(*event)
+
+    def _run_stage(self, role: str, chat_history: List[Dict[str, Any]], emit=None) -> str:
+        agent = self.agents[role]
+        if self.response_cache.enabled:
+            # Only replay replies of the tier this call would try first
+            config_list = (getattr(agent, "llm_config", None) or {}).get("config_list") or [None]
+            cached = self.response_cache.get(self._cache_key(agent, chat_history, config_list[0]))
+            if cached is not None:
+                logger.info(f"{agent.name} reply served from cache ({len(cached)} chars)")
+                return cached
+
+        logger.info(f"Executing: {agent.name}")
+        stream = None
+        if self.stream:
+            stream = StageStream(role, STAGE_OUTPUTS.get(role, []), emit=emit or self._emit_stream_event)
+        reply, config = self._generate(agent, chat_history, stream)
+        if isinstance(reply, dict):
+            reply = reply.get("content") or ""
+        logger.info(f"{agent.name} reply length: {len(str(reply)) if reply else 0}")
+        if not reply or not str(reply).strip():
+            return "I will now generate the required files as instructed."
+        if self.response_cache.enabled:
+            self.response_cache.put(self._cache_key(agent, chat_history, config), agent.name, reply)
+        return reply
+
+    def _run_fanout(self, roles: List[str], contexts: Dict[str, List[Dict[str, Any]]]) -> List[str]:
+        # Contexts are built before any stage starts, so every stage sees the
+        # same snapshot of the transcript. progress_callback and
+        # stream_callback are only ever called from this thread, since UI
+        # callbacks (Streamlit) cannot be driven from worker threads; streamed
+        # partial output is queued by the workers and relayed here.
+        logger.info(f"Fan-out: running {', '.join(roles)} concurrently")
+        if self.progress_callback:
+            for role in roles:
+                self.progress_callback(role, "running")
+
+        replies: Dict[str, str] = {}
+        events: "queue.Queue" = queue.Queue()
+        with ThreadPoolExecutor(max_workers=len(roles), thread_name_prefix="fanout") as pool:
+            futures = {pool.submit(self._run_stage, role, contexts[role], events.put): role for role in roles}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                while not events.empty():
+                    self._emit_stream_event(events.get_nowait())
+                for future in done:
+                    role = futures[future]
+                    replies[role] = future.result()
+                    if self.progress_callback:
+                        self.progress_callback(role, "completed")
+
+        return [replies[role] for role in roles]
     
-    def initiate_workflow(self, user_request: str) -> Dict[str, Any]:
+    def _checkpoint(self, status: str = "running"):
+        if self.checkpoint_store is None:
+            return
+        state = {
+            "status": status,
+            "user_request": self.user_request,
+            "pipeline": self.pipeline,
+            "position": self.position,
+            "review_iteration_count": self.review_iteration_count,
+            "convergence": self.convergence.state(),
+            "files": self.files,
+            "file_sources": self.file_sources,
+        }
         try:
-            if not user_request or not user_request.strip():
-                logger.error("Empty user request received")
-                return {
-                    "status": "error",
-                    "error": "User request cannot be empty",
-                    "review_iterations": 0,
-                }
-            
-            logger.info("=" * 80)
-            logger.info("WORKFLOW INITIATED")
-            logger.info("=" * 80)
-            log_agent_action(logger, "User", "Request", user_request[:100])
-            
-            from agents import get_llm_config
-            llm_config = get_llm_config()
-            
-            groupchat = self.create_group_chat()
-            manager = self.create_manager(groupchat, llm_config)
-            for agent in self.agents.values():
-                agent._oai_manager = manager
-                
-            logger.info("Starting agent conversation...")
-            
-            # self.agents["Controller_agent"].initiate_chat(
-            #     manager,
-            #     message=user_request,
-            # )
-            system_context = f"""
+            self.checkpoint_store.save(self.run_id, state, self.transcript.view())
+        except OSError as e:
+            logger.warning(f"Failed to checkpoint run {self.run_id}: {str(e)}")
+
+    def _mark_failed(self, error: str) -> Dict[str, Any]:
+        if self.checkpoint_store is not None:
+            try:
+                self.checkpoint_store.update_status(self.run_id, "failed", error)
+            except OSError as e:
+                logger.warning(f"Failed to update checkpoint for run {self.run_id}: {str(e)}")
+        return {
+            "status": "error",
+            "error": error,
+            "review_iterations": self.review_iteration_count,
+            "run_id": self.run_id,
+        }
+
+    def _start(self, user_request: str):
+        logger.info("=" * 80)
+        logger.info("WORKFLOW INITIATED")
+        logger.info("=" * 80)
+        log_agent_action(logger, "User", "Request", user_request[:100])
+
+        system_context = f"""
             You are Controller_agent in a multi-agent software factory.
 
             Rules:
@@ -92,100 +550,151 @@ class WorkflowOrchestrator:
             User Request:
             {user_request}
             """
-            groupchat.messages.append({
-                "role": "system",
-                "content": system_context
-            })
-            groupchat.messages.append({
-                "role": "assistant",
-                "content": "Controller_agent: Requirements_Agent must generate requirements.md based on the user request."
-            })
-            
-            pipeline = [
-                "Controller_agent",
-                "Requirements_Agent",
-                "coding_agent",
-                "review_agent",
-                "Documentation_Agent",
-                "QA_Agent",
-                "Deployment_agent",
-                "UI_agent",
-            ]
-
-            i = 0
+        self.user_request = user_request
+        if self.checkpoint_store is not None:
+            # A fresh start replaces whatever an earlier run left under this id
+            self.checkpoint_store.delete(self.run_id)
+        self.transcript = TranscriptLog(self.max_resident_chars)
+        self.files = {}
+        self.file_sources = {}
+        self.review_iteration_count = 0
+        self.convergence = ReviewConvergence()
+        self._record_message("System", system_context, role="system")
+        self._record_message(
+            "Controller_agent",
+            "Controller_agent: Requirements_Agent must generate requirements.md based on the user request."
+        )
+        self.pipeline = list(PIPELINE)
+        self.position = 0
+        self._checkpoint()
+
+    def _restore(self):
+        state = self.checkpoint_store.load(self.run_id) if self.checkpoint_store else None
+        if state is None:
+            raise LookupError(f"No checkpoint found for run {self.run_id}")
+
+        logger.info("=" * 80)
+        logger.info(f"WORKFLOW RESUMED - run {self.run_id} at stage {state['position']}")
+        logger.info("=" * 80)
+
+        self.user_request = state["user_request"]
+        self.transcript = TranscriptLog(self.max_resident_chars)
+        for message in state["messages"]:
+            self.transcript.append(
+                message["name"],
+                message["content"],
+                role=message["role"],
+                artifacts=message.get("artifacts", ()),
+            )
+        self.files = dict(state["files"])
+        self.file_sources = dict(state["file_sources"])
+        self.review_iteration_count = state["review_iteration_count"]
+        self.convergence = ReviewConvergence(state.get("convergence"))
+        self.pipeline = list(state["pipeline"])
+        self.position = state["position"]
+
+        if self.progress_callback:
+            for role in dict.fromkeys(self.pipeline[:self.position]):
+                self.progress_callback(role, "completed")
+
+    def initiate_workflow(self, user_request: str) -> Dict[str, Any]:
+        if not user_request or not user_request.strip():
+            logger.error("Empty user request received")
+            return {
+                "status": "error",
+                "error": "User request cannot be empty",
+                "review_iterations": 0,
+            }
+        return self._run(lambda: self._start(user_request))
+
+    def resume(self) -> Dict[str, Any]:
+        """Continue this orchestrator's run_id from its last checkpoint."""
+        return self._run(self._restore)
+
+    def _run(self, prepare) -> Dict[str, Any]:
+        # Keep this run's workspace safe from garbage collection while it runs
+        with active_workspace(self.run_id):
+            return self._execute(prepare)
+
+    def _execute(self, prepare) -> Dict[str, Any]:
+        try:
+            prepare()
+            logger.info("Starting agent conversation...")
+
+            pipeline = self.pipeline
+            i = self.position
             while i < len(pipeline):
                 if i > 40:
                     raise RuntimeError("Workflow runaway detected — terminating safely.")
                 role = pipeline[i]
 
-                agent = self.agents[role]
-                logger.info(f"Executing: {agent.name}")                
+                if self.parallel_fanout and pipeline[i:i + len(FANOUT_STAGES)] == FANOUT_STAGES:
+                    contexts = {r: self._build_context(r) for r in FANOUT_STAGES}
+                    replies = self._run_fanout(FANOUT_STAGES, contexts)
+                    for fanout_role, reply in zip(FANOUT_STAGES, replies):
+                        self._record_message(fanout_role, reply)
+                    i += len(FANOUT_STAGES)
+                    self.position = i
+                    self._checkpoint()
+                    continue
+
                 if self.progress_callback:
                     self.progress_callback(role, "running")
-                chat_history = [
-                    {"role": m.get("role", "assistant"), "content": m.get("content", "")}
-                    for m in groupchat.messages
-                ]
-                reply = agent.generate_reply(chat_history)
-                logger.info(f"{agent.name} reply length: {len(str(reply)) if reply else 0}")
-                if not reply or not str(reply).strip():
-                    reply = "I will now generate the required files as instructed."
+                reply = None
+                if role == "review_agent" and self.static_gate:
+                    reply = static_review(self.files)
+                    if reply:
+                        logger.info(f"Static check rejected main.py; skipping the review_agent call\n{reply}")
+                if reply is None:
+                    chat_history = self._build_context(role)
+                    reply = self._run_stage(role, chat_history)
+                    if role == "coding_agent" and self._wants_patch():
+                        reply = self._revise_code(role, chat_history, reply)
 
                 if self.progress_callback:
                     self.progress_callback(role, "completed")
-                if not reply or not str(reply).strip():
-                    raise RuntimeError(f"{agent.name} produced empty output")
-                groupchat.messages.append({
-                    "role": "assistant",
-                    "content": reply
-                })
+                self._record_message(role, reply)
                 if role == "review_agent" and "FIX_REQUIRED" in reply:
                     self.review_iteration_count += 1
-                    if self.review_iteration_count < self.max_review_iterations:
-                        pipeline.insert(i + 1, "coding_agent")
+                    stalled = self.convergence.observe(self.files.get("main.py", ""), reply)
+                    if stalled:
+                        logger.warning(f"Review loop stopped after {self.review_iteration_count} iteration(s): {stalled}")
+                    elif self.review_iteration_count < self.max_review_iterations:
+                        # Have the fix reviewed again before moving on
+                        pipeline[i + 1:i + 1] = ["coding_agent", "review_agent"]
                     else:
                         logger.warning("Review limit reached — forcing approval")
                 i += 1
+                self.position = i
+                self._checkpoint()
 
             
             logger.info("=" * 80)
             logger.info("WORKFLOW COMPLETED - Extracting generated files...")
             logger.info("=" * 80)
+            logger.info(
+                f"Transcript: {len(self.transcript)} messages / {self.transcript.total_chars} chars, "
+                f"{self.transcript.spilled_records} superseded messages spilled to disk"
+            )
             
             
-            workspace_path = os.path.abspath("workspace")
+            workspace_path = workspace_for(self.run_id)
             os.makedirs(workspace_path, exist_ok=True)
             
-            files_extracted = 0
-            for msg in groupchat.messages:
-                content = msg.get("content", "")
-                agent_name = msg.get("role", "assistant")
-                
-                file_pattern = r"===BEGIN_FILE\s*:\s*([^\n=]+)===([\s\S]*?)===END_FILE==="
-                matches = re.findall(file_pattern, content, re.DOTALL)
-                
-                for filename, file_content in matches:
-                    try:
-                        filename = filename.strip()
-                        
-                        file_content = file_content.strip()
-                        filepath = os.path.join(workspace_path, filename)
-                        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                        with open(filepath, "w", encoding="utf-8") as f:
-                            f.write(file_content)
-                        
-                        logger.info(f"[{agent_name}] Extracted file: {filename} ({len(file_content)} chars)")
-                        files_extracted += 1
-                    except Exception as e:
-                        logger.warning(f"[{agent_name}] Failed to extract {filename}: {str(e)}")
+            files_extracted = len(self.files)
+            try:
+                written, unchanged = write_workspace_files(self.files, workspace_path)
+                logger.info(f"Workspace files: {written} written, {unchanged} unchanged")
+            except OSError as e:
+                logger.warning(f"Failed to write workspace files: {str(e)}")
             
             logger.info(f"Extracted {files_extracted} files to workspace (no code execution)")
             
             if files_extracted == 0:
                 logger.warning("No files were extracted from agent responses!")
                 logger.warning("Check if agents are following the expected code generation format.")
-                logger.debug(f"Total messages: {len(groupchat.messages)}")
-                for i, msg in enumerate(groupchat.messages):
+                logger.debug(f"Total messages: {len(self.transcript)}")
+                for i, msg in enumerate(self.transcript):
                     if '```python' in msg.get("content", ""):
                         logger.debug(f"Message {i} from {msg.get('name', 'unknown')} contains Python code")
             
@@ -200,7 +709,11 @@ class WorkflowOrchestrator:
                 logger.info(f"Total tests: {test_results.get('total_tests', 0)}, "
                            f"Passed: {test_results.get('total_passed', 0)}, "
                            f"Failed: {test_results.get('total_failed', 0)}, "
-                           f"Errors: {test_results.get('total_errors', 0)}")
+                           f"Errors: {test_results.get('total_errors', 0)}, "
+                           f"Skipped: {test_results.get('total_skipped', 0)}")
+                if test_results.get('coverage'):
+                    logger.info(f"Coverage: {test_results['coverage']['line_percent']}% of lines, "
+                               f"{test_results['coverage']['function_percent']}% of functions")
             except Exception as e:
                 logger.warning(f"Test execution failed: {str(e)}")
                 test_results = {
@@ -210,56 +723,65 @@ class WorkflowOrchestrator:
                     'total_passed': 0,
                     'total_failed': 0,
                     'total_errors': 0,
+                    'total_skipped': 0,
                     'test_results': []
                 }
             
+            try:
+                gc_workspaces()
+            except OSError as e:
+                logger.warning(f"Workspace cleanup failed: {str(e)}")
+            
+            self._checkpoint(status="completed")
             return {
                 "status": "success",
-                "total_messages": len(groupchat.messages),
+                "run_id": self.run_id,
+                "workspace": workspace_path,
+                "total_messages": len(self.transcript),
                 "review_iterations": self.review_iteration_count,
                 "files_extracted": files_extracted,
-                "messages": groupchat.messages,
+                "messages": self.transcript.view(),
                 "test_results": test_results,
             }
             
         except KeyboardInterrupt:
             logger.warning("Workflow interrupted by user")
-            return {
-                "status": "error",
-                "error": "Workflow was interrupted by user",
-                "review_iterations": self.review_iteration_count,
-            }
+            return self._mark_failed("Workflow was interrupted by user")
         except TimeoutError as e:
             log_error_with_context(logger, e, "Workflow timeout")
-            return {
-                "status": "error",
-                "error": f"Workflow timed out: {str(e)}",
-                "review_iterations": self.review_iteration_count,
-            }
+            return self._mark_failed(f"Workflow timed out: {str(e)}")
         except ValueError as e:
             log_error_with_context(logger, e, "Invalid configuration")
-            return {
-                "status": "error",
-                "error": f"Configuration error: {str(e)}",
-                "review_iterations": self.review_iteration_count,
-            }
+            return self._mark_failed(f"Configuration error: {str(e)}")
         except ConnectionError as e:
             log_error_with_context(logger, e, "Network connection failed")
-            return {
-                "status": "error",
-                "error": f"Connection error: {str(e)}. Please check your internet connection.",
-                "review_iterations": self.review_iteration_count,
-            }
+            return self._mark_failed(f"Connection error: {str(e)}. Please check your internet connection.")
         except Exception as e:
             log_error_with_context(logger, e, "Workflow execution failed")
             error_type = type(e).__name__
-            return {
-                "status": "error",
-                "error": f"{error_type}: {str(e)}",
-                "review_iterations": self.review_iteration_count,
-            }
+            return self._mark_failed(f"{error_type}: {str(e)}")
+
+
+def run_workflow(user_request: str, agents: Dict[str, Any], progress_callback=None,
+                 parallel_fanout: bool = True, stream_callback=None) -> Dict[str, Any]:
+    orchestrator = WorkflowOrchestrator(
+        agents,
+        max_review_iterations=5,
+        progress_callback=progress_callback,
+        parallel_fanout=parallel_fanout,
+        stream_callback=stream_callback,
+    )
+    return orchestrator.initiate_workflow(user_request)
 
 
-def run_workflow(user_request: str, agents: Dict[str, Any], progress_callback=None) -> Dict[str, Any]:
-    orchestrator = WorkflowOrchestrator(agents, max_review_iterations=5, progress_callback=progress_callback)
-    return orchestrator.initiate_workflow(user_request)
\ No newline at end of file
+def resume_workflow(run_id: str, agents: Dict[str, Any], progress_callback=None,
+                    parallel_fanout: bool = True, stream_callback=None) -> Dict[str, Any]:
+    orchestrator = WorkflowOrchestrator(
+        agents,
+        max_review_iterations=5,
+        progress_callback=progress_callback,
+        parallel_fanout=parallel_fanout,
+        stream_callback=stream_callback,
+        run_id=run_id,
+    )
+    return orchestrator.resume()
\ No newline at end of file